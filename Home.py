@@ -1,9 +1,26 @@
 import streamlit as st
-import requests
+import io
 import urllib.parse
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import requests
+from concurrent.futures import as_completed
+from spotify_client import http_client
+from spotify_client.add_tracks_form import display_add_tracks_form
+from spotify_client.api import create_playlist, get_spotify_user_profile
+from spotify_client.charts import (TABLE_FEATURES, feature_table, pie_chart_features, plotly_feature_chart,
+                                   plotly_feature_chart_multi, radar_chart_features, radar_chart_features_multi)
+from spotify_client.concurrency import ContextThreadPoolExecutor
+from spotify_client.debug_panel import display_debug_panel
+from spotify_client.features import get_track_features, get_tracks_features
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.metrics import start_rerun
+from spotify_client.playlist_index import invalidate_playlist_index
+from spotify_client.rate_limit import TokenBucket
+from spotify_client.search import get_local_search_index, get_track_id, search_track_id
+from spotify_client.startup import lazy_import
+from spotify_client.tokens import UserToken, get_client_credentials_token, refresh_session_token
+from spotify_client.warmup import adopt_warm_up, start_warm_up
+
+pd = lazy_import("pandas")
 
 
 REDIRECT_URI = 'https://betterspotify.streamlit.app/'
@@ -15,16 +32,24 @@ CLIENT_SECRET = '3e5da1df76304243992bc28bd0243a53'
 AUTH_URL = 'https://accounts.spotify.com/authorize'
 TOKEN_URL = 'https://accounts.spotify.com/api/token'
 
+BULK_SEARCH_RATE = 10  # search requests per second
+BULK_WORKERS = 8
+
 
 def main():
+    rerun_stats = start_rerun()
     st.title("Spotify Track Features Finder")
     st.warning("To ensure a seamless experience with the application, please refer to the README on GitHub for detailed instructions. The application is currently pending approval for Spotify's extension request, which will allow it to function openly without restrictions.")
+    refresh_session_token(st.session_state)
     if 'access_token' in st.session_state:
         st.success("Successfully authenticated with Spotify.")
+        adopt_warm_up(st.session_state)
         display_app()
+        display_bulk_analysis()
         display_playlist_creation()
     else:
         handle_oauth_flow()
+    display_debug_panel(rerun_stats)
 
 
 def handle_oauth_flow():
@@ -34,9 +59,11 @@ def handle_oauth_flow():
     code = st.query_params.get('code', None)
     if code:
         if 'access_token' not in st.session_state or not st.session_state['access_token']:
-            access_token = exchange_code_for_access_token(code)
-            if access_token:
-                st.session_state['access_token'] = access_token
+            user_token = exchange_code_for_access_token(code)
+            if user_token:
+                st.session_state['user_token'] = user_token
+                st.session_state['access_token'] = user_token.access_token
+                start_warm_up(st.session_state, user_token.access_token)
                 st.rerun()
             else:
                 st.error("Failed to authenticate with Spotify.")
@@ -65,97 +92,16 @@ def exchange_code_for_access_token(code):
         "client_id": CLIENT_ID,
         "client_secret": CLIENT_SECRET
     }
-    response = requests.post(TOKEN_URL, data=data)
+    response = http_client.post(TOKEN_URL, data=data)
     if response.status_code == 200:
-        return response.json().get('access_token')
+        return UserToken.from_response(response.json(), CLIENT_ID, CLIENT_SECRET)
     else:
         st.error(f"Error getting access token: {response.text}")
         return None
 
 
-def get_spotify_user_profile(access_token):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get("https://api.spotify.com/v1/me", headers=headers)
-    return response.json() if response.ok else None
-
-
-def radar_chart_features(features):
-    categories = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'liveness', 'speechiness']
-
-    data = [features[feat] for feat in categories]
-
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatterpolar(
-        r=data,
-        theta=categories,
-        fill='toself',
-        name='Available Audio Features'
-    ))
-
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 1]
-            )),
-        showlegend=True
-    )
-    return fig
-
-
-def plotly_feature_chart(features):
-    features_df = pd.DataFrame([features])
-    features_df = features_df[['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'liveness', 'speechiness']]
-    features_df = features_df.T.reset_index()
-    features_df.columns = ['Feature', 'Value']
-
-    fig = px.bar(features_df, x='Feature', y='Value', title="Audio Features",
-                 labels={'Value': 'Measure', 'Feature': 'Audio Feature'},
-                 color='Feature',
-                 height=400)
-    fig.update_layout(xaxis={'categoryorder':'total descending'})
-    return fig
-
-
 def get_access_token(client_id, client_secret):
-    url = "https://accounts.spotify.com/api/token"
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded"
-    }
-    payload = {
-        "grant_type": "client_credentials"
-    }
-    response = requests.post(url, headers=headers, data=payload, auth=(client_id, client_secret))
-    access_token = response.json().get('access_token')
-    return access_token
-
-
-def get_track_id(track_name, artist, access_token):
-    url = f"https://api.spotify.com/v1/search"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    params = {
-        "q": f"track: {track_name} artist: {artist}",
-        "type": "track",
-        "limit": 1
-    }
-    response = requests.get(url, headers=headers, params=params)
-    results = response.json().get('tracks', {}).get('items', [])
-    if results:
-        return results[0]['id']
-    else:
-        return None
-
-
-def get_track_features(track_id, access_token):
-    url = f"https://api.spotify.com/v1/audio-features/{track_id}"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    response = requests.get(url, headers=headers)
-    return response.json()
+    return get_client_credentials_token(client_id, client_secret)
 
 
 def display_app():
@@ -177,14 +123,19 @@ def display_app():
             st.error("Track not found")
         else:
             access_token = get_access_token(CLIENT_ID, CLIENT_SECRET)
-            track_id = get_track_id(track_name, artist_name, access_token)
+            track_id = get_track_id(track_name, artist_name, access_token, st.session_state)
             if track_id:
-                features = get_track_features(track_id, access_token)
+                try:
+                    features = get_track_features(track_id, access_token)
+                except SpotifyAPIError:
+                    features = None
                 spotify_url = f"https://open.spotify.com/track/{track_id}"
                 st.markdown(
                     f'<img src="https://upload.wikimedia.org/wikipedia/commons/thumb/8/84/Spotify_icon.svg/232px-Spotify_icon.svg.png" width="20"/> Play: <a href="{spotify_url}" target="_blank">Listen on Spotify</a>',
                     unsafe_allow_html=True)
-                if chosen_visualization == "Bar Chart":
+                if not features:
+                    st.error("Audio features are not available for this track.")
+                elif chosen_visualization == "Bar Chart":
                     fig = plotly_feature_chart(features)
                     st.plotly_chart(fig)
                 elif chosen_visualization == "Pie Chart":
@@ -194,13 +145,9 @@ def display_app():
                     st.plotly_chart(fig1)
                 elif chosen_visualization == "Numeric Table":
                     st.subheader('Audio Features Overview')
-                    df = pd.DataFrame([features])
-                    df = df[
-                        ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'liveness',
-                         'speechiness',
-                         'tempo', 'loudness']]
-                    st.write(df.T)
-                display_add_to_playlist(track_id)
+                    st.write(feature_table(features))
+                st.subheader("Add Track to Playlists or Liked Songs")
+                display_add_tracks_form([track_id], "lookup")
             else:
                 st.error("Track not found.")
 
@@ -219,19 +166,134 @@ def display_app():
         """)
 
 
+# Bulk track analysis
+def read_track_list(uploaded_file):
+    """
+    Reads an uploaded CSV into a DataFrame with `track` and `artist` columns, or None if no track column is found.
+    Raises ValueError (e.g. pandas' EmptyDataError and ParserError) or UnicodeDecodeError if it can't be parsed.
+    """
+    csv = pd.read_csv(uploaded_file)
+    columns = {column.strip().lower(): column for column in csv.columns}
+    track_column = next((columns[name] for name in ("track", "track_name", "track name", "name", "title")
+                         if name in columns), None)
+    artist_column = next((columns[name] for name in ("artist", "artist_name", "artist name", "artists")
+                          if name in columns), None)
+    if track_column is None:
+        return None
+    return pd.DataFrame({
+        "track": csv[track_column].fillna("").astype(str),
+        "artist": csv[artist_column].fillna("").astype(str) if artist_column else "",
+    })
+
+
+def bulk_result_rows(tracks, resolved, access_token):
+    features_by_id = get_tracks_features([track_id for _, track_id in resolved if track_id], access_token)
+    rows = []
+    for i, track_id in resolved:
+        features = features_by_id.get(track_id) or {}
+        row = {"row": i, "track": tracks.at[i, "track"], "artist": tracks.at[i, "artist"], "track_id": track_id}
+        row.update((name, features.get(name)) for name in TABLE_FEATURES)
+        rows.append(row)
+    return rows
+
+
+def iter_bulk_features(tracks, access_token, local_index=None, batch_size=100):
+    """
+    Resolves every (track, artist) row to a track ID concurrently, under a token-bucket limit on search requests.
+    Yields result rows each time batch_size IDs are resolved and their features fetched in one call.
+    """
+    limiter = TokenBucket(BULK_SEARCH_RATE)
+    resolved = []
+    with ContextThreadPoolExecutor(max_workers=BULK_WORKERS) as executor:
+        futures = {executor.submit(search_track_id, row.track, row.artist, access_token, local_index, limiter): i
+                   for i, row in enumerate(tracks.itertuples())}
+        try:
+            for future in as_completed(futures):
+                try:
+                    track_id = future.result()
+                except requests.RequestException:
+                    # A dropped connection loses this row only; it is reported as unmatched
+                    track_id = None
+                resolved.append((futures[future], track_id))
+                if sum(1 for _, track_id in resolved if track_id) >= batch_size:
+                    yield bulk_result_rows(tracks, resolved, access_token)
+                    resolved = []
+        except BaseException:
+            # Don't make an error (or an abandoned generator) wait for every queued, rate-limited search
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    if resolved:
+        yield bulk_result_rows(tracks, resolved, access_token)
+
+
+def to_parquet_bytes(df):
+    """Serializes df as Parquet, or returns None when no Parquet engine (pyarrow/fastparquet) is installed."""
+    buffer = io.BytesIO()
+    try:
+        df.to_parquet(buffer, index=False)
+    except ImportError:
+        return None
+    return buffer.getvalue()
+
+
+def display_bulk_analysis():
+    st.subheader("Bulk Track Analysis")
+    uploaded_file = st.file_uploader("Upload a CSV file with track and artist columns", type="csv")
+    if uploaded_file is not None and st.button("Analyze Tracks"):
+        try:
+            tracks = read_track_list(uploaded_file)
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Could not read the CSV file: {e}")
+            return
+        if tracks is None:
+            st.error("The CSV file needs a track (or name) column.")
+        else:
+            access_token = get_access_token(CLIENT_ID, CLIENT_SECRET)
+            local_index = get_local_search_index(st.session_state)
+            progress_bar = st.progress(0.0, text="Looking up tracks...")
+            table = st.empty()
+            rows = []
+            try:
+                for batch_rows in iter_bulk_features(tracks, access_token, local_index):
+                    rows.extend(batch_rows)
+                    progress_bar.progress(len(rows) / len(tracks), text=f"Analyzed {len(rows)} of {len(tracks)} tracks")
+                    table.dataframe(pd.DataFrame(rows).drop(columns="row"))
+            except (SpotifyAPIError, requests.RequestException) as e:
+                st.error(f"Failed to fetch audio features: {e}")
+            progress_bar.empty()
+            table.empty()
+            if rows:
+                results = pd.DataFrame(rows).sort_values("row").drop(columns="row").reset_index(drop=True)
+                st.session_state['bulk_results'] = results
+
+    results = st.session_state.get('bulk_results')
+    if results is None:
+        return
+    st.dataframe(results)
+    st.download_button("Download CSV", results.to_csv(index=False), "track_features.csv", "text/csv")
+    parquet = to_parquet_bytes(results)
+    if parquet is not None:
+        st.download_button("Download Parquet", parquet, "track_features.parquet", "application/octet-stream")
+
+    found = results.dropna(subset=["danceability"])
+    features_df = found.set_index(found["track"] + " - " + found["artist"])
+    features_df = features_df[~features_df.index.duplicated()]
+    chosen_tracks = st.multiselect("Tracks to compare:", list(features_df.index), default=list(features_df.index[:5]))
+    chosen_chart = st.selectbox("Comparison chart:", ["Bar Chart", "Radar Chart"])
+    if chosen_tracks:
+        if chosen_chart == "Bar Chart":
+            st.plotly_chart(plotly_feature_chart_multi(features_df.loc[chosen_tracks]))
+        else:
+            st.plotly_chart(radar_chart_features_multi(features_df.loc[chosen_tracks]))
 
-# Playlist creation
-def create_playlist(user_id, name, description, public, access_token):
-    url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    data = {"name": name,
-            "description": description,
-            "public": public
-            }
-    response = requests.post(url, headers=headers, json=data)
-    return response.json()
+    matched = results.dropna(subset=["track_id"])
+    if len(matched):
+        st.subheader("Add Found Tracks to Playlists or Liked Songs")
+        labels = dict(zip(matched["track_id"], matched["track"] + " - " + matched["artist"]))
+        display_add_tracks_form(list(labels), "bulk", labels)
 
 
+# Playlist creation
 def display_playlist_creation():
     st.subheader("Create a New Playlist")
     name = st.text_input("Playlist Name")
@@ -247,6 +309,7 @@ def display_playlist_creation():
                 user_id = user_profile['id']
                 new_playlist = create_playlist(user_id, name, description, public, access_token)
                 if new_playlist:
+                    invalidate_playlist_index(st.session_state)
                     st.success("Playlist created successfully!")
                 else:
                     st.error("Failed to create playlist.")
@@ -254,87 +317,10 @@ def display_playlist_creation():
                 st.error("Could not retrieve user profile. Make sure you are authenticated.")
 
 
-def pie_chart_features(features):
-    labels = ['Danceability', 'Energy', 'Valence', 'Acousticness', 'Instrumentalness', 'Liveness', 'Speechiness']
-    values = [features[label.lower()] for label in labels]
-
-    fig = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.3)])
-    fig.update_layout(title_text='Audio Features Distribution')
-    return fig
-
-
 def display_pie_chart(features):
     fig = pie_chart_features(features)
     st.plotly_chart(fig)
 
 
-#adding tracks to playlist
-def get_user_playlists(user_id, access_token):
-    url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    return response.json().get('items', [])
-
-
-def add_tracks_to_playlist(playlist_id, track_id, access_token):
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    data = {"uris": [f"spotify:track:{track_id}"]}
-    response = requests.post(url, headers=headers, json=data)
-    return response.status_code in (200, 201)
-
-
-def add_track_to_liked_songs(track_id, access_token):
-    url = "https://api.spotify.com/v1/me/tracks"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    data = {"ids": [track_id]}
-    response = requests.put(url, headers=headers, json=data)
-    return response.status_code in (200, 201)
-
-
-def display_add_to_playlist(track_id):
-    st.subheader("Add Track to Playlist or Liked Songs")
-    try:
-        access_token = st.session_state['access_token']
-        user_profile = get_spotify_user_profile(access_token)
-        user_id = user_profile['id']
-        playlists = get_user_playlists(user_id, access_token)
-    except ValueError:
-        st.error("Failed to fetch playlists. Please re-authenticate.")
-        return
-
-    playlist_options = ["Liked Songs"] + [playlist['name'] for playlist in playlists]
-    if "selected_option" not in st.session_state:
-        st.session_state["selected_option"] = playlist_options[0]
-
-    st.session_state["selected_option"] = st.selectbox("Select a Playlist or Liked Songs", playlist_options, index=playlist_options.index(st.session_state["selected_option"]))
-
-    if "add_track_button" not in st.session_state:
-        st.session_state["add_track_button"] = False
-
-    if st.button("Add Track"):
-        st.session_state["add_track_button"] = True
-
-    if st.session_state["add_track_button"]:
-        selected_option = st.session_state["selected_option"]
-        if selected_option == "Liked Songs":
-            success = add_track_to_liked_songs(track_id, access_token)
-            if success:
-                st.success("Track added to liked songs!")
-            else:
-                st.error("Failed to add track to liked songs.")
-        else:
-            selected_playlist = next((playlist for playlist in playlists if playlist['name'] == selected_option),
-                                     None)
-            if selected_playlist:
-                success = add_tracks_to_playlist(selected_playlist['id'], track_id, access_token)
-                if success:
-                    st.success("Track added to playlist!")
-                else:
-                    st.error("Failed to add track to playlist.")
-            else:
-                st.error("Selected playlist not found.")
-
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,393 @@
+"""
+Local stand-in for the parts of the Spotify Web API the app uses.
+
+Serves deterministic generated data for /me, /me/tracks, /audio-features, /search,
+/recommendations, /tracks, playlists, top items, recently played and the token
+endpoint, with configurable latency, page-size limits, library size and injected
+429/5xx responses. GET responses carry an ETag and If-None-Match is answered with
+a 304. Every request is counted per endpoint.
+
+    server = FakeSpotify(FakeSpotifyConfig(library_size=10000, latency=0.05))
+    server.start()
+    http_client.redirect("https://api.spotify.com", server.url)
+    http_client.redirect("https://accounts.spotify.com", server.url)
+
+It can also run on its own (`python benchmarks/fake_spotify.py --port 8765`). GET /__fake__/requests returns
+the per-endpoint counts and DELETE /__fake__/requests resets them.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MARKETS = [f"{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(180)]
+
+
+@dataclass
+class FakeSpotifyConfig:
+    library_size: int = 10000
+    playlist_count: int = 60
+    playlist_size: int = 2000
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    max_page_size: int = 50
+    max_playlist_page_size: int = 100
+    error_429_rate: float = 0.0
+    error_5xx_rate: float = 0.0
+    # Share of playlist additions that are applied but still answered with a 503, like a lost response
+    lost_write_rate: float = 0.0
+    retry_after: int = 1
+    seed: int = 0
+
+
+def track_id(n):
+    """22-character base62-looking ID, like real Spotify IDs."""
+    return f"{n:022d}"
+
+
+def make_track(n):
+    return {
+        "id": track_id(n),
+        "uri": f"spotify:track:{track_id(n)}",
+        "type": "track",
+        "name": f"Track {n}",
+        "artists": [{"id": track_id(n % 997 + 10 ** 9), "name": f"Artist {n % 997}", "type": "artist"}],
+        "album": {
+            "id": track_id(n % 5003 + 2 * 10 ** 9),
+            "name": f"Album {n % 5003}",
+            "images": [{"url": f"https://i.scdn.co/image/{n}-{size}", "height": size, "width": size}
+                       for size in (640, 300, 64)],
+            "available_markets": MARKETS,
+        },
+        "available_markets": MARKETS,
+        "duration_ms": 180000 + n % 120000,
+        "popularity": n % 100,
+        "is_local": False,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id(n)}"},
+    }
+
+
+def make_features(track):
+    digest = hashlib.blake2b(track.encode(), digest_size=16).digest()
+    unit = [b / 255 for b in digest]
+    return {
+        "id": track,
+        "uri": f"spotify:track:{track}",
+        "type": "audio_features",
+        "danceability": unit[0], "energy": unit[1], "key": digest[2] % 12, "loudness": -60 + 60 * unit[3],
+        "mode": digest[4] % 2, "speechiness": unit[5], "acousticness": unit[6], "instrumentalness": unit[7],
+        "liveness": unit[8], "valence": unit[9], "tempo": 60 + 140 * unit[10],
+        "duration_ms": 120000 + digest[11] * 1000, "time_signature": 3 + digest[12] % 3,
+    }
+
+
+class FakeSpotify:
+    def __init__(self, config=None):
+        self.config = config or FakeSpotifyConfig()
+        self.requests = Counter()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server = None
+        # Liked songs, newest first
+        self.saved = [(n, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1700000000 - i * 600)))
+                      for i, n in enumerate(range(self.config.library_size))]
+        self.playlists = {}
+        for p in range(self.config.playlist_count):
+            start = p * 137
+            self.playlists[track_id(10 ** 12 + p)] = {
+                "name": f"Playlist {p}",
+                "tracks": [(start + i) % (self.config.library_size * 2) for i in range(self.config.playlist_size)],
+                "snapshot": 1,
+            }
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self, port=0):
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+
+    def count(self, key):
+        with self._lock:
+            self.requests[key] += 1
+
+    def injected_error(self):
+        """Returns 429 or 503 according to the configured error rates, or None."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.config.error_429_rate:
+            return 429
+        if roll < self.config.error_429_rate + self.config.error_5xx_rate:
+            return 503
+        return None
+
+    def playlist_object(self, playlist_id):
+        playlist = self.playlists[playlist_id]
+        return {
+            "id": playlist_id,
+            "name": playlist["name"],
+            "snapshot_id": f"{playlist_id}-{playlist['snapshot']}",
+            "uri": f"spotify:playlist:{playlist_id}",
+            "tracks": {"total": len(playlist["tracks"])},
+            "owner": {"id": "benchmark_user"},
+            "images": [],
+        }
+
+
+def _page(items, query, max_limit, default_limit=20):
+    offset = int(query.get("offset", ["0"])[0])
+    limit = min(int(query.get("limit", [str(default_limit)])[0]), max_limit)
+    return {"items": items[offset:offset + limit], "total": len(items), "offset": offset, "limit": limit,
+            "next": None if offset + limit >= len(items) else f"?offset={offset + limit}&limit={limit}"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = b"" if body is None else json.dumps(body).encode()
+        if self.command == "GET" and status == 200:
+            etag = '"' + hashlib.blake2b(payload, digest_size=8).hexdigest() + '"'
+            headers = dict(headers or {}, ETag=etag)
+            if self.headers.get("If-None-Match") == etag:
+                status, payload = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith("application/json") and raw:
+            return json.loads(raw)
+        return {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+
+    def _handle(self, method):
+        config = self.fake.config
+        parsed = urlparse(self.path)
+        path = parsed.path
+        query = parse_qs(parsed.query)
+        body = self._body() if method in ("POST", "PUT") else None
+        if path == "/__fake__/requests":
+            if method == "DELETE":
+                self.fake.reset_counts()
+            with self.fake._lock:
+                return self._send(200, dict(self.fake.requests))
+        self.fake.count(f"{method} {re.sub(r'/[0-9]{22}', '/{id}', path)}")
+
+        if config.latency:
+            time.sleep(config.latency + random.uniform(0, config.latency_jitter))
+        error = self.fake.injected_error()
+        if error == 429:
+            return self._send(429, {"error": {"status": 429}}, {"Retry-After": str(config.retry_after)})
+        if error:
+            return self._send(error, {"error": {"status": error}})
+
+        route = _ROUTES.get((method, re.sub(r"/[0-9]{22}", "/{id}", path)))
+        if route is None:
+            return self._send(404, {"error": {"status": 404, "message": f"No fake for {method} {path}"}})
+        ids = re.findall(r"[0-9]{22}", path)
+        status, payload = route(self.fake, query, body, *ids)
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def _token(fake, query, body):
+    payload = {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600}
+    if body.get("grant_type") != "client_credentials":
+        payload["refresh_token"] = "fake-refresh-token"
+    return 200, payload
+
+
+def _me(fake, query, body):
+    return 200, {"id": "benchmark_user", "display_name": "Benchmark User", "email": "bench@example.com",
+                 "images": []}
+
+
+def _saved_tracks(fake, query, body):
+    offset = int(query.get("offset", ["0"])[0])
+    limit = min(int(query.get("limit", ["20"])[0]), fake.config.max_page_size)
+    items = [{"added_at": added_at, "track": make_track(n)} for n, added_at in fake.saved[offset:offset + limit]]
+    page = _page(items, {"offset": ["0"], "limit": [str(limit)]}, limit)
+    page.update(total=len(fake.saved), offset=offset)
+    return 200, page
+
+
+def _save_tracks(fake, query, body):
+    if len(body.get("ids", [])) > 50:
+        return 400, {"error": {"status": 400, "message": "Too many ids requested"}}
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    with fake._lock:
+        fake.saved[:0] = [(int(i), now) for i in body.get("ids", [])]
+    return 200, None
+
+
+def _audio_features(fake, query, body):
+    ids = query.get("ids", [""])[0].split(",")
+    if len(ids) > 100:
+        return 400, {"error": {"status": 400, "message": "Too many ids requested"}}
+    return 200, {"audio_features": [make_features(i) for i in ids if i]}
+
+
+def _audio_features_one(fake, query, body, track):
+    return 200, make_features(track)
+
+
+def _search(fake, query, body):
+    match = re.search(r"Track (\d+)", query.get("q", [""])[0])
+    items = [make_track(int(match.group(1)))] if match else []
+    return 200, {"tracks": {"items": items, "total": len(items)}}
+
+
+def _tracks(fake, query, body):
+    ids = query.get("ids", [""])[0].split(",")
+    return 200, {"tracks": [make_track(int(i)) for i in ids if i]}
+
+
+def _recommendations(fake, query, body):
+    seed = int(query.get("seed_tracks", ["0"])[0].split(",")[0])
+    limit = int(query.get("limit", ["20"])[0])
+    return 200, {"tracks": [make_track(seed + i + 1) for i in range(limit)]}
+
+
+def _playlists(fake, query, body, user=None):
+    items = [fake.playlist_object(playlist_id) for playlist_id in fake.playlists]
+    return 200, _page(items, query, fake.config.max_page_size)
+
+
+def _create_playlist(fake, query, body, user=None):
+    with fake._lock:
+        playlist_id = track_id(10 ** 12 + len(fake.playlists))
+        fake.playlists[playlist_id] = {"name": body.get("name", ""), "tracks": [], "snapshot": 1}
+    return 201, fake.playlist_object(playlist_id)
+
+
+def _playlist_items(fake, query, body, playlist_id):
+    tracks = fake.playlists[playlist_id]["tracks"]
+    items = [{"added_at": "2024-01-01T00:00:00Z", "track": make_track(n)} for n in tracks]
+    return 200, _page(items, query, fake.config.max_playlist_page_size, default_limit=100)
+
+
+def _add_playlist_items(fake, query, body, playlist_id):
+    uris = body.get("uris", [])
+    if len(uris) > 100:
+        return 400, {"error": {"status": 400, "message": "Too many tracks"}}
+    with fake._lock:
+        playlist = fake.playlists[playlist_id]
+        position = body.get("position", len(playlist["tracks"]))
+        playlist["tracks"][position:position] = [int(uri.rsplit(":", 1)[1]) for uri in uris]
+        playlist["snapshot"] += 1
+        lost = fake._random.random() < fake.config.lost_write_rate
+    if lost:
+        return 503, {"error": {"status": 503, "message": "Service unavailable"}}
+    return 201, {"snapshot_id": fake.playlist_object(playlist_id)["snapshot_id"]}
+
+
+def _top_items(item_type):
+    def handler(fake, query, body):
+        limit = int(query.get("limit", ["20"])[0])
+        if item_type == "tracks":
+            items = [make_track(n) for n in range(limit)]
+        else:
+            items = [{"id": track_id(10 ** 9 + n), "name": f"Artist {n}", "type": "artist"} for n in range(limit)]
+        return 200, {"items": items, "total": limit}
+    return handler
+
+
+def _recently_played(fake, query, body):
+    limit = int(query.get("limit", ["20"])[0])
+    after = int(query.get("after", ["0"])[0])
+    now_ms = int(time.time() * 1000)
+    items = [{"track": make_track(n), "played_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z",
+                                                                 time.gmtime((now_ms - n * 240000) / 1000))}
+             for n in range(limit) if now_ms - n * 240000 > after]
+    cursors = {"after": str(now_ms), "before": str(now_ms - limit * 240000)} if items else None
+    return 200, {"items": items, "cursors": cursors, "limit": limit}
+
+
+_ROUTES = {
+    ("POST", "/api/token"): _token,
+    ("GET", "/v1/me"): _me,
+    ("GET", "/v1/me/tracks"): _saved_tracks,
+    ("PUT", "/v1/me/tracks"): _save_tracks,
+    ("GET", "/v1/audio-features"): _audio_features,
+    ("GET", "/v1/audio-features/{id}"): _audio_features_one,
+    ("GET", "/v1/search"): _search,
+    ("GET", "/v1/tracks"): _tracks,
+    ("GET", "/v1/recommendations"): _recommendations,
+    ("GET", "/v1/me/playlists"): _playlists,
+    ("GET", "/v1/users/benchmark_user/playlists"): _playlists,
+    ("POST", "/v1/users/benchmark_user/playlists"): _create_playlist,
+    ("GET", "/v1/playlists/{id}/tracks"): _playlist_items,
+    ("POST", "/v1/playlists/{id}/tracks"): _add_playlist_items,
+    ("GET", "/v1/me/top/tracks"): _top_items("tracks"),
+    ("GET", "/v1/me/top/artists"): _top_items("artists"),
+    ("GET", "/v1/me/player/recently-played"): _recently_played,
+}
+
+
+def serve(config, port=0, ready=None):
+    """Runs a fake server until the process is terminated; puts its URL on the `ready` queue once listening."""
+    server = FakeSpotify(config).start(port)
+    if ready is not None:
+        ready.put(server.url)
+    threading.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local fake of the Spotify Web API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--library-size", type=int, default=FakeSpotifyConfig.library_size)
+    parser.add_argument("--latency", type=float, default=FakeSpotifyConfig.latency)
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+    parser.add_argument("--lost-write-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    config = FakeSpotifyConfig(library_size=args.library_size, latency=args.latency,
+                               error_429_rate=args.error_429_rate, error_5xx_rate=args.error_5xx_rate,
+                               lost_write_rate=args.lost_write_rate)
+    print(f"Fake Spotify API listening on http://127.0.0.1:{args.port}")
+    serve(config, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Drives the page logic against the local fake Spotify API and reports wall time, request counts, peak memory
+and the memory a session keeps holding afterwards.
+
+    python benchmarks/run_benchmarks.py --library-size 10000 --latency 0.05 --repeat 2
+
+Every scenario runs --repeat times against the same caches, so the first run is cold and the rest are warm.
+The fake server runs in a child process so that neither its CPU time nor its allocations are measured.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import runpy
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The package reads its cache locations at import time, so keep the benchmark's caches out of the real ones.
+_cache_dir = tempfile.mkdtemp(prefix="spotify-bench-")
+os.environ.setdefault("FEATURES_CACHE_PATH", os.path.join(_cache_dir, "audio_features.sqlite3"))
+os.environ.setdefault("LIBRARY_CACHE_DIR", os.path.join(_cache_dir, "library"))
+os.environ.setdefault("COMBINED_PLAYLISTS_DIR", os.path.join(_cache_dir, "combined"))
+
+import requests  # noqa: E402
+from fake_spotify import FakeSpotifyConfig, serve  # noqa: E402
+from spotify_client import http_client  # noqa: E402
+from spotify_client.metrics import metrics  # noqa: E402
+from spotify_client.moods import MOOD_OPTIONS  # noqa: E402
+from spotify_client.pagination import iter_saved_track_records, iter_saved_tracks  # noqa: E402
+from spotify_client.playlist_index import load_playlist_index  # noqa: E402
+from spotify_client.scheduler import Scheduler, set_scheduler  # noqa: E402
+from spotify_client.startup import HEAVY_MODULES  # noqa: E402
+from spotify_client.writes import LIKED_SONGS, add_tracks  # noqa: E402
+
+ACCESS_TOKEN = "fake-token"
+USER_ID = "benchmark_user"
+
+
+def load_page(filename):
+    """Loads a Streamlit page's functions without running its main()."""
+    return runpy.run_path(os.path.join(ROOT, filename), run_name="benchmark")
+
+
+class FakeServerProcess:
+    def __init__(self, config):
+        self.config = config
+        self.url = None
+        self._process = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=serve, args=(self.config, 0, ready), daemon=True)
+        self._process.start()
+        self.url = ready.get(timeout=30)
+        return self
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join()
+
+    def request_counts(self, reset=False):
+        """Per-endpoint request counts seen by the server since the last reset."""
+        response = requests.request("DELETE" if reset else "GET", f"{self.url}/__fake__/requests")
+        return response.json()
+
+
+def mood_stream(pages, fixtures):
+    """Streams the library until MOOD_TRACK_LIMIT tracks match one mood, like the single-mood page flow."""
+    mood_page = pages["mood"]
+    found = 0
+    with closing(mood_page["stream_mood_tracks"](ACCESS_TOKEN, MOOD_OPTIONS["Energetic"])) as progress:
+        for _, _, matched_uris in progress:
+            found += len(matched_uris)
+    return {"matched": found}
+
+
+def mood_all(pages, fixtures):
+    """Syncs the whole library and creates one playlist per mood."""
+    pages["mood"]["create_mood_playlists_from_library"](USER_ID, "Benchmark", dict(MOOD_OPTIONS), ACCESS_TOKEN)
+    return {}
+
+
+def add_to_playlist(pages, fixtures):
+    """Loads the playlist index and adds one track to a playlist and to Liked Songs."""
+    index = load_playlist_index(ACCESS_TOKEN)
+    playlist_id = next(iter(index.by_id))
+    results = add_tracks(["0000000000000000000042"], [playlist_id, LIKED_SONGS], ACCESS_TOKEN)
+    return {"playlists": len(index), "failed": sum(not result.ok for result in results.values())}
+
+
+def bulk_add(pages, fixtures):
+    """Adds 250 tracks to three playlists and to Liked Songs in one batched write."""
+    destinations = list(fixtures["playlists"].by_id)[:3] + [LIKED_SONGS]
+    track_ids = [f"{n:022d}" for n in range(250)]
+    results = add_tracks(track_ids, destinations, ACCESS_TOKEN)
+    return {"destinations": len(destinations), "failed": sum(not result.ok for result in results.values())}
+
+
+def profile(pages, fixtures):
+    profile_page = pages["profile"]
+    profile_page["st"].session_state.pop('profile_data', None)
+    profile_data = profile_page["load_profile_data"](ACCESS_TOKEN)
+    return {"top_lists": len(profile_data["top_items"])}
+
+
+def combine(pages, fixtures):
+    """Combines the first four playlists into a new one."""
+    sources = list(fixtures["playlists"].by_id.values())[:4]
+    merged = pages["combine"]["combine_playlists"](USER_ID, "Benchmark combined", sources, ACCESS_TOKEN)
+    return {"merged": merged}
+
+
+def saved_tracks(pages, fixtures):
+    """Holds the whole saved library the way a session does; compare retained memory with saved_tracks_raw."""
+    records = [record for page in iter_saved_track_records(ACCESS_TOKEN) for record in page]
+    return {"tracks": len(records), "held": records}
+
+
+def saved_tracks_raw(pages, fixtures):
+    """Baseline for saved_tracks: the raw /me/tracks items."""
+    items = [item for page in iter_saved_tracks(ACCESS_TOKEN) for item in page]
+    return {"tracks": len(items), "held": items}
+
+
+SCENARIOS = {
+    "mood_stream": mood_stream,
+    "mood_all": mood_all,
+    "add_to_playlist": add_to_playlist,
+    "bulk_add": bulk_add,
+    "profile": profile,
+    "combine": combine,
+    "saved_tracks": saved_tracks,
+    "saved_tracks_raw": saved_tracks_raw,
+}
+
+
+def run_scenario(name, pages, fixtures, server):
+    server.request_counts(reset=True)
+    metrics.reset()
+    tracemalloc.start()
+    started = time.perf_counter()
+    details = SCENARIOS[name](pages, fixtures)
+    wall = time.perf_counter() - started
+    # Whatever the scenario still holds ("held") is what a session would keep alive between reruns
+    retained, peak = tracemalloc.get_traced_memory()
+    details.pop("held", None)
+    tracemalloc.stop()
+    summary = metrics.summary()
+    errors = sum(row["errors"] for row in summary)
+    by_endpoint = server.request_counts()
+    return {
+        "scenario": name,
+        "wall_s": round(wall, 3),
+        "requests": sum(by_endpoint.values()),
+        "client_errors": errors,
+        "received_kib": round(sum(row["KiB"] for row in summary), 1),
+        "peak_mib": round(peak / 2 ** 20, 2),
+        "retained_mib": round(retained / 2 ** 20, 2),
+        "by_endpoint": by_endpoint,
+        **details,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--library-size", type=int, default=10000)
+    parser.add_argument("--playlists", type=int, default=60)
+    parser.add_argument("--playlist-size", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--page-size", type=int, default=50, help="largest page the fake server returns")
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+    parser.add_argument("--lost-write-rate", type=float, default=0.0,
+                        help="share of playlist additions that are applied but answered with a 503")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="scheduler requests per second (default: the app's own limits)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeServerProcess(FakeSpotifyConfig(
+        library_size=args.library_size, playlist_count=args.playlists, playlist_size=args.playlist_size,
+        latency=args.latency, latency_jitter=args.jitter, max_page_size=args.page_size,
+        error_429_rate=args.error_429_rate, error_5xx_rate=args.error_5xx_rate,
+        lost_write_rate=args.lost_write_rate,
+    )).start()
+    http_client.redirect("https://api.spotify.com", server.url)
+    http_client.redirect("https://accounts.spotify.com", server.url)
+    if args.rate:
+        set_scheduler(Scheduler(rate=args.rate, burst=args.rate))
+
+    pages = {
+        "home": load_page("Home.py"),
+        "mood": load_page(os.path.join("pages", "Mood-Based Playlist Creation.py")),
+        "profile": load_page(os.path.join("pages", "Profile Management.py")),
+        "combine": load_page(os.path.join("pages", "Combine Playlists.py")),
+    }
+    # Lazy import costs are measured by spotify_client.startup; keep them out of the first scenario's numbers
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+    results = []
+    try:
+        fixtures = {"playlists": load_playlist_index(ACCESS_TOKEN)}
+        for name in args.scenarios or SCENARIOS:
+            for run in range(args.repeat):
+                result = run_scenario(name, pages, fixtures, server)
+                result["run"] = run + 1
+                results.append(result)
+                print(f"{name:<16} run {run + 1}  {result['wall_s']:>8.3f}s  {result['requests']:>6} requests  "
+                      f"{result['client_errors']:>4} errors  {result['received_kib']:>9.1f} KiB received  "
+                      f"{result['peak_mib']:>8.2f} MiB peak  {result['retained_mib']:>8.2f} MiB retained")
+    finally:
+        server.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
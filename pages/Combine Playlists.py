@@ -1,10 +1,27 @@
 import streamlit as st
-import requests
+import json
+import os
+import re
+import uuid
+from spotify_client.api import create_playlist, get_spotify_user_profile
+from spotify_client.concurrency import ContextThreadPoolExecutor
+from spotify_client.debug_panel import display_debug_panel
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.metrics import start_rerun
+from spotify_client.pagination import iter_playlist_track_records
+from spotify_client.playlist_index import get_playlist_index, invalidate_playlist_index
+from spotify_client.tokens import refresh_session_token
+from spotify_client.writes import add_to_playlist
+
+
+COMBINED_DIR = os.environ.get("COMBINED_PLAYLISTS_DIR", os.path.join(".cache", "combined"))
+MAX_CONCURRENT_PLAYLISTS = 4
 
 
 def main():
+    rerun_stats = start_rerun()
     st.title("Combine your Playlists into ONE Playlist!")
-    st.warning("Currently working on this section / not available yet")
+    refresh_session_token(st.session_state)
     if 'access_token' not in st.session_state or not st.session_state['access_token']:
         st.error("Please log in through the Home page first.")
         st.stop()
@@ -16,11 +33,169 @@ def main():
             st.error("Access token has expired or is invalid. Please log in again.")
             st.stop()
 
+        display_combine_playlists(user_profile['id'], access_token)
+    display_debug_panel(rerun_stats)
+
+
+def get_playlist_track_uris(playlist_id, access_token):
+    """
+    Returns the URIs of every track in a playlist, in playlist order. Local files can't be added through the API and are skipped.
+    """
+    uris = []
+    for page in iter_playlist_track_records(playlist_id, access_token):
+        uris.extend(record.uri for record in page if record.uri and not record.is_local)
+    return uris
+
+
+def fetch_playlists_track_uris(playlist_ids, access_token):
+    """Fetches the track URIs of several playlists concurrently; returns a dict keyed by playlist ID."""
+    with ContextThreadPoolExecutor(max_workers=MAX_CONCURRENT_PLAYLISTS) as executor:
+        results = executor.map(lambda playlist_id: get_playlist_track_uris(playlist_id, access_token), playlist_ids)
+        return dict(zip(playlist_ids, results))
+
+
+def merge_track_uris(uri_lists):
+    """Concatenates the lists and drops duplicates, keeping the first occurrence of every URI."""
+    return list(dict.fromkeys(uri for uris in uri_lists for uri in uris))
+
+
+def _safe_name(value):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", value)
+
+
+def combined_state_dir(user_id):
+    return os.path.join(COMBINED_DIR, _safe_name(user_id))
+
+
+def combined_state_path(user_id, playlist_id):
+    return os.path.join(combined_state_dir(user_id), f"{_safe_name(playlist_id)}.json")
 
-def get_spotify_user_profile(access_token):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get("https://api.spotify.com/v1/me", headers=headers)
-    return response.json() if response.ok else None
+
+def load_combined_states(user_id, playlists_by_id):
+    """
+    Returns {combined playlist ID: saved state} for the combined playlists this user created and still owns.
+    Unreadable state files are skipped.
+    """
+    directory = combined_state_dir(user_id)
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    states = {}
+    for playlist_id in (name[:-len(".json")] for name in names if name.endswith(".json")):
+        playlist = playlists_by_id.get(playlist_id)
+        if playlist is None or (playlist.get('owner') or {}).get('id') != user_id:
+            continue
+        try:
+            with open(combined_state_path(user_id, playlist_id)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(state, dict) and 'name' in state and isinstance(state.get('sources'), dict):
+            states[playlist_id] = state
+    return states
+
+
+def save_combined_state(user_id, playlist_id, name, sources):
+    os.makedirs(combined_state_dir(user_id), exist_ok=True)
+    path = combined_state_path(user_id, playlist_id)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"name": name, "sources": sources}, f)
+    os.replace(tmp_path, path)
+
+
+def combine_playlists(user_id, name, source_playlists, access_token):
+    """
+    Creates a new playlist holding every track of the source playlists once, in first-seen order.
+    """
+    source_ids = [playlist['id'] for playlist in source_playlists]
+    uris_by_playlist = fetch_playlists_track_uris(source_ids, access_token)
+    merged_uris = merge_track_uris(uris_by_playlist[playlist_id] for playlist_id in source_ids)
+
+    playlist = create_playlist(user_id, name, "Combined from " + ", ".join(p['name'] for p in source_playlists),
+                               False, access_token)
+    playlist_id = playlist.get('id')
+    invalidate_playlist_index(st.session_state)
+    if not playlist_id:
+        st.error("Failed to create playlist.")
+        return None
+    try:
+        add_to_playlist(playlist_id, merged_uris, access_token)
+    except SpotifyAPIError as e:
+        st.error(f"Error adding tracks: {e}")
+        return None
+    save_combined_state(user_id, playlist_id, name, {p['id']: p['snapshot_id'] for p in source_playlists})
+    return len(merged_uris)
+
+
+def resync_combined_playlist(user_id, playlist_id, state, playlists_by_id, access_token):
+    """
+    Appends tracks that are new in the source playlists. Sources whose snapshot_id hasn't changed are skipped.
+    Returns the number of tracks added.
+    """
+    changed_ids = [source_id for source_id, snapshot_id in state['sources'].items()
+                   if source_id in playlists_by_id and playlists_by_id[source_id]['snapshot_id'] != snapshot_id]
+    if not changed_ids:
+        return 0
+
+    uris_by_playlist = fetch_playlists_track_uris(changed_ids + [playlist_id], access_token)
+    existing_uris = set(uris_by_playlist.pop(playlist_id))
+    new_uris = [uri for uri in merge_track_uris(uris_by_playlist[source_id] for source_id in changed_ids)
+                if uri not in existing_uris]
+    try:
+        add_to_playlist(playlist_id, new_uris, access_token)
+    except SpotifyAPIError as e:
+        st.error(f"Error adding tracks: {e}")
+        return None
+
+    sources = dict(state['sources'])
+    sources.update((source_id, playlists_by_id[source_id]['snapshot_id']) for source_id in changed_ids)
+    save_combined_state(user_id, playlist_id, state['name'], sources)
+    return len(new_uris)
+
+
+def display_combine_playlists(user_id, access_token):
+    try:
+        playlists_by_id = get_playlist_index(st.session_state, access_token).by_id
+    except SpotifyAPIError as e:
+        st.error(f"Failed to fetch playlists: {e}")
+        return
+
+    mode = st.radio("What do you want to do?", ["Create a combined playlist", "Re-sync a combined playlist"])
+    if mode == "Create a combined playlist":
+        source_ids = st.multiselect("Select the playlists to combine:", list(playlists_by_id),
+                                    format_func=lambda playlist_id: playlists_by_id[playlist_id]['name'])
+        name = st.text_input("Enter the combined playlist name:")
+        if st.button("Combine Playlists"):
+            if len(source_ids) < 2:
+                st.error("Select at least two playlists.")
+            elif not name:
+                st.error("Please provide a playlist name.")
+            else:
+                with st.spinner("Combining playlists..."):
+                    try:
+                        count = combine_playlists(user_id, name, [playlists_by_id[i] for i in source_ids],
+                                                  access_token)
+                    except SpotifyAPIError as e:
+                        st.error(f"Failed to fetch playlist tracks: {e}")
+                        return
+                if count is not None:
+                    st.success(f"Combined playlist created with {count} tracks!")
+    else:
+        states = load_combined_states(user_id, playlists_by_id)
+        if not states:
+            st.info("No combined playlists to re-sync yet.")
+            return
+        playlist_id = st.selectbox("Select a combined playlist:", list(states),
+                                   format_func=lambda playlist_id: states[playlist_id]['name'])
+        if st.button("Re-sync"):
+            with st.spinner("Checking source playlists for new tracks..."):
+                try:
+                    count = resync_combined_playlist(user_id, playlist_id, states[playlist_id], playlists_by_id,
+                                                     access_token)
+                except SpotifyAPIError as e:
+                    st.error(f"Failed to fetch playlist tracks: {e}")
+                    return
+            if count is not None:
+                st.success(f"Added {count} new tracks." if count else "Already up to date.")
 
 
 if __name__ == "__main__":
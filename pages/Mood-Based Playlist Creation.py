@@ -1,10 +1,27 @@
-import streamlit as st
 import requests
-import math
+import streamlit as st
+from contextlib import closing
+from spotify_client.api import create_playlist, get_spotify_user_profile
+from spotify_client.concurrency import ContextThreadPoolExecutor
+from spotify_client.debug_panel import display_debug_panel
+from spotify_client.features import get_tracks_features
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.library import has_snapshot, sync_library
+from spotify_client.metrics import start_rerun
+from spotify_client.moods import FEATURE_RANGES, MOOD_OPTIONS, build_feature_frame, classify_moods, mood_track_ids
+from spotify_client.pagination import iter_saved_track_records
+from spotify_client.playlist_index import invalidate_playlist_index
+from spotify_client.tokens import refresh_session_token
+from spotify_client.writes import add_to_playlist
+
+
+MOOD_TRACK_LIMIT = 30
 
 
 def main():
+    rerun_stats = start_rerun()
     st.title("Mood-Based Playlist Creation")
+    refresh_session_token(st.session_state)
     if 'access_token' not in st.session_state or not st.session_state['access_token']:
         st.error("Please log in through the Home page first.")
         st.stop()
@@ -17,37 +34,25 @@ def main():
             st.stop()
 
         display_mood_based_playlist_creation()
-
-
-def create_playlist(user_id, name, description, public, access_token):
-    url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    data = {"name": name,
-            "description": description,
-            "public": public
-            }
-    response = requests.post(url, headers=headers, json=data)
-    return response.json()
-
-
-def get_spotify_user_profile(access_token):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get("https://api.spotify.com/v1/me", headers=headers)
-    return response.json() if response.ok else None
+    display_debug_panel(rerun_stats)
 
 
 def display_mood_based_playlist_creation():
     st.subheader("Mood-Based Playlist Creation")
 
     # Mood selection
-    mood_options = {
-        "Happy": {"valence_range": (0.5, 1.0), "energy_range": (0.4, 1.0)},
-        "Relaxed": {"valence_range": (0.3, 0.7), "energy_range": (0.0, 0.6)},
-        "Energetic": {"valence_range": (0.4, 1.0), "energy_range": (0.7, 1.0)},
-        "Sad": {"valence_range": (0.0, 0.4), "energy_range": (0.0, 0.5)}
-    }
-
-    mood = st.selectbox("Select a mood:", list(mood_options.keys()))
+    mood_options = dict(MOOD_OPTIONS)
+    with st.expander("Define a custom mood"):
+        custom_features = st.multiselect("Features to filter on:", list(FEATURE_RANGES))
+        custom_criteria = {}
+        for feature in custom_features:
+            low, high = FEATURE_RANGES[feature]
+            custom_criteria[f"{feature}_range"] = st.slider(feature.capitalize(), low, high, (low, high))
+    if custom_criteria:
+        mood_options["Custom"] = custom_criteria
+
+    create_all = st.checkbox("Create all mood playlists at once")
+    mood = st.selectbox("Select a mood:", list(mood_options.keys()), disabled=create_all)
     playlist_name = st.text_input("Enter the playlist name:")
     if st.button("Create Mood-Based Playlist"):
         if not playlist_name:
@@ -64,110 +69,139 @@ def display_mood_based_playlist_creation():
             if not user_id:
                 st.error("Failed to retrieve user ID from profile.")
                 return
-            warning_placeholder = st.empty()
-            warning_placeholder = st.warning("Fetching and filtering tracks, this might take a while. Please be patient...")
-
-            # Fetch user's saved tracks
-            user_tracks = get_user_saved_tracks(access_token)
 
-            # Filter tracks by mood
-            mood_tracks = filter_tracks_by_mood(user_tracks, mood_options[mood], access_token)
+            # With a local library snapshot only the newest page needs fetching, so classify from it directly
+            if create_all or has_snapshot(user_id):
+                selected_moods = mood_options if create_all else {mood: mood_options[mood]}
+                create_mood_playlists_from_library(user_id, playlist_name, selected_moods, access_token)
+                return
+            progress_bar = st.progress(0.0, text="Fetching and filtering tracks...")
+            mood_track_uris = []
+            try:
+                for scanned, total, matched_uris in stream_mood_tracks(access_token, mood_options[mood]):
+                    mood_track_uris.extend(matched_uris)
+                    found = len(mood_track_uris)
+                    progress_bar.progress(mood_scan_progress(scanned, total, found),
+                                          text=f"Scanned {scanned} of {total} saved tracks, found {found} {mood} tracks")
+            except (SpotifyAPIError, requests.RequestException) as e:
+                progress_bar.empty()
+                st.error(f"Failed to fetch tracks: {e}")
+                return
+            progress_bar.empty()
 
-            if mood_tracks:
+            # Only create the playlist once the scan has succeeded, so a failed scan leaves nothing behind
+            if mood_track_uris:
                 playlist = create_playlist(user_id, playlist_name, f"A {mood} playlist.", True, access_token)
                 playlist_id = playlist.get('id')
-
+                invalidate_playlist_index(st.session_state)
                 if not playlist_id:
                     st.error("Failed to create playlist.")
-                    warning_placeholder.empty()
-                    return
-
-                success = add_tracks_to_playlist(playlist_id, mood_tracks, access_token)
-                warning_placeholder.empty()
-
-                if success:
+                elif add_tracks_to_playlist(playlist_id, mood_track_uris, access_token):
                     st.success(f"{mood} playlist created successfully!")
-                else:
-                    st.error("Failed to add tracks to playlist.")
             else:
                 st.error(f"No tracks found that match the {mood} mood.")
-                warning_placeholder.empty()
 
 
-def get_user_saved_tracks(access_token, limit=50):
+def create_mood_playlists_from_library(user_id, playlist_name, mood_options, access_token, limit=MOOD_TRACK_LIMIT):
     """
-    Fetches all of the user's saved tracks from Spotify by handling pagination.
+    Syncs the local library snapshot and creates one playlist per mood from a single vectorized classification.
     """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"https://api.spotify.com/v1/me/tracks?limit={limit}"
-
-    tracks = []
-    while url:
-        response = requests.get(url, headers=headers)
-        if response.ok:
-            data = response.json()
-            tracks.extend(data.get('items', []))
-            url = data.get('next')  # Get the next page URL from the response
-        else:
-            st.error(f"Failed to fetch tracks: {response.status_code} - {response.text}")
-            break
-
-    return tracks
-
-
-def filter_tracks_by_mood(tracks, mood_criteria, access_token):
+    with st.spinner("Syncing your saved tracks..."):
+        try:
+            snapshot = sync_library(user_id, access_token,
+                                    lambda track_ids: get_tracks_features(track_ids, access_token))
+        except (SpotifyAPIError, requests.RequestException) as e:
+            st.error(f"Failed to fetch tracks: {e}")
+            return
+
+    matches = classify_moods(snapshot.feature_frame(), mood_options)
+    for mood in mood_options:
+        mood_track_uris = [f"spotify:track:{track_id}" for track_id in mood_track_ids(matches, mood, limit)]
+        if not mood_track_uris:
+            st.error(f"No tracks found that match the {mood} mood.")
+            continue
+        name = f"{playlist_name} - {mood}" if len(mood_options) > 1 else playlist_name
+        playlist = create_playlist(user_id, name, f"A {mood} playlist.", True, access_token)
+        playlist_id = playlist.get('id')
+        invalidate_playlist_index(st.session_state)
+        if not playlist_id:
+            st.error(f"Failed to create the {mood} playlist.")
+        elif add_tracks_to_playlist(playlist_id, mood_track_uris, access_token):
+            st.success(f"{mood} playlist created successfully!")
+
+
+def mood_scan_progress(scanned, total, found, limit=MOOD_TRACK_LIMIT):
+    if found >= limit or not total:
+        return 1.0
+    return min(1.0, max(scanned / total, found / limit))
+
+
+def iter_saved_track_id_batches(access_token, batch_size=100, on_total=None):
     """
-    Filters tracks based on the mood criteria (valence and energy ranges).
+    Yields the IDs of the user's saved tracks in batches of batch_size, as pages stream in.
     """
-    mood_tracks = []
-    for track in tracks:
-        track_id = track['track']['id']
-        features = get_track_features(track_id, access_token)
-
-        if features:
-            valence = features.get('valence')
-            energy = features.get('energy')
-
-            if (mood_criteria["valence_range"][0] <= valence <= mood_criteria["valence_range"][1] and
-                    mood_criteria["energy_range"][0] <= energy <= mood_criteria["energy_range"][1]):
-                mood_tracks.append(f"spotify:track:{track_id}")
-
-        if len(mood_tracks) >= 30:
-            break
-
-    return mood_tracks if mood_tracks else None
-
-
-def get_track_features(track_id, access_token):
-    url = f"https://api.spotify.com/v1/audio-features/{track_id}"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    response = requests.get(url, headers=headers)
-    return response.json()
-
-
-def add_tracks_to_playlist(playlist_id, track_uris, access_token, batch_size=100):
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    total_tracks = len(track_uris)
-    num_batches = math.ceil(total_tracks / batch_size)
-
-    for i in range(num_batches):
-        batch_start = i * batch_size
-        batch_end = min(batch_start + batch_size, total_tracks)
-        batch_uris = track_uris[batch_start:batch_end]
+    batch = []
+    with closing(iter_saved_track_records(access_token, on_total=on_total)) as pages:
+        for page in pages:
+            batch.extend(record.id for record in page if record.id)
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+    if batch:
+        yield batch
+
+
+def iter_batch_features(id_batches, access_token):
+    """
+    Pairs each batch of track IDs with its audio features.
+    The next batch's features are fetched in the background while the caller filters the current one.
+    """
+    with closing(id_batches), ContextThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for batch_ids in id_batches:
+            future = executor.submit(get_tracks_features, batch_ids, access_token)
+            if pending is not None:
+                yield pending[0], pending[1].result()
+            pending = (batch_ids, future)
+        if pending is not None:
+            yield pending[0], pending[1].result()
+
+
+def filter_tracks_by_mood(track_ids, features_by_id, mood_criteria):
+    """
+    Filters tracks based on the mood criteria (`<feature>_range` bounds, e.g. valence and energy).
+    """
+    matches = classify_moods(build_feature_frame(track_ids, features_by_id), {"mood": mood_criteria})
+    return [f"spotify:track:{track_id}" for track_id in mood_track_ids(matches, "mood")]
 
-        data = {"uris": batch_uris}
 
-        response = requests.post(url, headers=headers, json=data)
+def stream_mood_tracks(access_token, mood_criteria, limit=MOOD_TRACK_LIMIT):
+    """
+    Streams the saved-track library through page fetch -> batched feature fetch -> mood filter.
+    Yields (tracks scanned, library size, newly matched URIs) after each batch and stops
+    fetching as soon as `limit` matching tracks have been found.
+    """
+    library = {"total": 0}
+    id_batches = iter_saved_track_id_batches(access_token, on_total=lambda total: library.update(total=total))
+    scanned = 0
+    found = 0
+    with closing(iter_batch_features(id_batches, access_token)) as batches:
+        for batch_ids, features_by_id in batches:
+            scanned += len(batch_ids)
+            matched_uris = filter_tracks_by_mood(batch_ids, features_by_id, mood_criteria)[:limit - found]
+            found += len(matched_uris)
+            yield scanned, library["total"], matched_uris
+            if found >= limit:
+                return
 
-        # Check if the request was successful
-        if response.status_code not in (200, 201):
-            st.error(f"Error adding tracks in batch {i + 1}: {response.status_code} - {response.text}")
-            return False  # If one batch fails, return False immediately
 
-    return True  # Return True if all batches succeed
+def add_tracks_to_playlist(playlist_id, track_uris, access_token):
+    try:
+        add_to_playlist(playlist_id, track_uris, access_token)
+    except (SpotifyAPIError, requests.RequestException) as e:
+        st.error(f"Error adding tracks: {e}")
+        return False
+    return True
 
 
 if __name__ == "__main__":
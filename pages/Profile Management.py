@@ -1,29 +1,58 @@
 import streamlit as st
-import requests
+import time
+from spotify_client.charts import play_count_chart, radar_chart_features
+from spotify_client.debug_panel import display_debug_panel
+from spotify_client.features import get_tracks_features
+from spotify_client.history import ListeningHistory, collect_history
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.metrics import start_rerun
+from spotify_client.profile import ITEM_TYPES, SESSION_KEY, TIME_RANGES, fetch_profile_data
+from spotify_client.tokens import refresh_session_token
+from spotify_client.warmup import adopt_warm_up
+
+
+PROFILE_DATA_TTL = 300
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
 def main():
+    rerun_stats = start_rerun()
     st.title("Profile Management")
+    refresh_session_token(st.session_state)
     if 'access_token' not in st.session_state:
         st.error("Please log in through the Home page first.")
         st.stop()  # Stop further execution of the script
-    display_user_profile()
-    display_user_top_items()
-    display_user_engagement()
-
-
-def get_spotify_user_profile(access_token):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get("https://api.spotify.com/v1/me", headers=headers)
-    return response.json() if response.ok else None
-
-
-def display_user_profile():
-    access_token = st.session_state['access_token']
-    if not access_token:
-        st.error("You need to log in through the Home page first.")
-        return
-    user_profile = get_spotify_user_profile(access_token)
+    adopt_warm_up(st.session_state)
+    if st.button("Refresh"):
+        st.session_state.pop(SESSION_KEY, None)
+    cached = st.session_state.get(SESSION_KEY)
+    profile_data = load_profile_data(st.session_state['access_token'])
+    display_user_profile(profile_data)
+    display_user_top_items(profile_data)
+    display_user_engagement(profile_data)
+    # Poll the history along with a fresh fetch of the profile data, so other reruns make no API calls
+    display_listening_history(profile_data, st.session_state['access_token'], poll=profile_data is not cached)
+    display_debug_panel(rerun_stats)
+
+
+def load_profile_data(access_token):
+    """
+    Returns everything this page shows (profile, every top-items combination and recently played).
+    The result is kept in the session for PROFILE_DATA_TTL seconds, so changing a selectbox costs no API calls;
+    right after login it is usually already there from the background warm-up.
+    """
+    cached = st.session_state.get(SESSION_KEY)
+    if cached and time.time() - cached['fetched_at'] < PROFILE_DATA_TTL:
+        return cached
+
+    profile_data = fetch_profile_data(access_token)
+    if profile_data['profile'] is not None:
+        st.session_state[SESSION_KEY] = profile_data
+    return profile_data
+
+
+def display_user_profile(profile_data):
+    user_profile = profile_data['profile']
     if user_profile:
         st.subheader("User Profile")
         st.write(f"Username: {user_profile['display_name']}")
@@ -34,24 +63,11 @@ def display_user_profile():
         st.error("Failed to fetch user profile")
 
 
-def get_user_top_items(access_token, item_type='tracks', time_range='medium_term'):
-    url = f"https://api.spotify.com/v1/me/top/{item_type}"
-    headers = {'Authorization': f'Bearer {access_token}'}
-    params = {"time_range": time_range, "limit": 10}
-    response = requests.get(url, headers=headers, params=params)
-    return response.json().get('items', [])
-
-
-def display_user_top_items():
+def display_user_top_items(profile_data):
     st.subheader("User's Top Tracks/Artists")
-    access_token = st.session_state['access_token']
-    if not access_token:
-        st.error("You need to log in through the Home page first.")
-        return
-
-    time_range = st.selectbox("Select TIme Range", ["short_term", "medium_term", "long_term"])
-    item_type = st.selectbox("Select Item Type", ["tracks", "artists"])
-    top_items = get_user_top_items(access_token, item_type, time_range)
+    time_range = st.selectbox("Select TIme Range", TIME_RANGES)
+    item_type = st.selectbox("Select Item Type", ITEM_TYPES)
+    top_items = profile_data['top_items'][(item_type, time_range)]
     if st.button("List Your Top TRACKS/ARTISTS"):
         if top_items:
             st.subheader(f"Your Top {item_type.capitalize()}")
@@ -62,7 +78,7 @@ def display_user_top_items():
                     st.write(item["name"])
         else:
             if item_type == "artists":
-                top_items = get_user_top_items(access_token, item_type="tracks", time_range=time_range)
+                top_items = profile_data['top_items'][("tracks", time_range)]
                 if top_items:
                     for item in top_items:
                         st.write(item['artists'][0]['name'])
@@ -72,16 +88,8 @@ def display_user_top_items():
                 st.write("No top items found")
 
 
-def get_user_engagement(access_token):
-    url = "https://api.spotify.com/v1/me/player/recently-played"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    return response.json().get('items', [])
-
-
-def display_user_engagement():
-    access_token = st.session_state['access_token']
-    recent_tracks = get_user_engagement(access_token)
+def display_user_engagement(profile_data):
+    recent_tracks = profile_data['recently_played']
     if recent_tracks:
         st.subheader("Recently Played Tracks")
         for track in recent_tracks[:5]:
@@ -96,5 +104,41 @@ def display_user_engagement():
         st.write("No recently played tracks found.")
 
 
+def display_listening_history(profile_data, access_token, poll=True):
+    """
+    Long-term statistics from the locally collected listening history (see spotify_client.history).
+    New plays are only fetched when poll is true; otherwise the stored history is shown as it is.
+    """
+    if not profile_data['profile']:
+        return
+    st.subheader("Listening History")
+    user_id = profile_data['profile']['id']
+    if not poll:
+        history = ListeningHistory.load(user_id)
+    else:
+        try:
+            history = collect_history(user_id, access_token,
+                                      lambda track_ids: get_tracks_features(track_ids, access_token))
+        except SpotifyAPIError as e:
+            st.error(f"Failed to update listening history: {e}")
+            return
+    if not len(history):
+        st.write("No plays collected yet. Plays are added when you log in and whenever this page reloads its data.")
+        return
+
+    aggregates = history.aggregates
+    since = time.strftime("%Y-%m-%d", time.gmtime(aggregates['first_played_at'] / 1000))
+    st.write(f"{len(history)} plays collected since {since}, on {len(aggregates['dates'])} days.")
+    st.write("Top artists:")
+    st.dataframe([{"artist": artist, "plays": plays} for artist, plays in history.top_artists()], hide_index=True)
+    st.plotly_chart(play_count_chart([f"{hour:02d}" for hour in range(24)], aggregates['hours'],
+                                     "Plays per hour of day (UTC)"))
+    st.plotly_chart(play_count_chart(WEEKDAYS, aggregates['weekdays'], "Plays per weekday"))
+    mean_features = history.mean_features()
+    if mean_features:
+        st.write("Average audio features of what you play:")
+        st.plotly_chart(radar_chart_features(mean_features))
+
+
 if __name__ == "__main__":
     main()
@@ -1,23 +1,100 @@
 import streamlit as st
-import requests
+from spotify_client import http_client
+from spotify_client.add_tracks_form import display_add_tracks_form
+from spotify_client.api import get_spotify_user_profile
+from spotify_client.debug_panel import display_debug_panel
+from spotify_client.features import get_tracks_features
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.library import sync_library
+from spotify_client.metrics import start_rerun
+from spotify_client.pagination import API_URL, get_all_items, iter_playlist_track_records
+from spotify_client.search import get_local_search_index, get_track_id
+from spotify_client.similarity import SIMILARITY_FEATURES, SimilarityIndex
+from spotify_client.tokens import refresh_session_token
+
+
+RECOMMENDATIONS_KEY = 'recommendations'
 
 
 def main():
+    rerun_stats = start_rerun()
     st.title("Recommendations by Track")
+    refresh_session_token(st.session_state)
     if 'access_token' not in st.session_state:
         st.error("Please log in through the Home page first.")
         st.stop()  # Stop further execution of the script
     display_recommendations()
+    display_debug_panel(rerun_stats)
+
+
+def get_similarity_index(access_token, include_playlists=False):
+    """
+    Returns this session's similarity index, adding any tracks that are new since it was last used.
+    """
+    if 'similarity_index' not in st.session_state:
+        st.session_state['similarity_index'] = SimilarityIndex()
+    index = st.session_state['similarity_index']
+
+    user_profile = get_spotify_user_profile(access_token)
+    if user_profile is None:
+        return index
+    snapshot = sync_library(user_profile['id'], access_token,
+                            lambda track_ids: get_tracks_features(track_ids, access_token))
+    index.add_snapshot(snapshot)
+
+    if include_playlists and not st.session_state.get('similarity_playlists_indexed'):
+        for playlist in get_all_items(f"{API_URL}/me/playlists", access_token):
+            track_ids = []
+            for page in iter_playlist_track_records(playlist['id'], access_token):
+                records = [record for record in page if record.id]
+                get_local_search_index(st.session_state).add_records(records)
+                track_ids.extend(record.id for record in records)
+            index.add_features(get_tracks_features([track_id for track_id in track_ids if track_id not in index],
+                                                   access_token))
+        st.session_state['similarity_playlists_indexed'] = True
+    return index
+
+
+def get_tracks(track_ids, access_token, batch_size=50):
+    url = "https://api.spotify.com/v1/tracks"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    tracks = []
+    for i in range(0, len(track_ids), batch_size):
+        response = http_client.get(url, headers=headers, params={"ids": ",".join(track_ids[i:i + batch_size])})
+        if not response.ok:
+            raise SpotifyAPIError(response)
+        tracks.extend(track for track in response.json().get('tracks', []) if track)
+    return tracks
 
 
-def recommend_similar_tracks(track_id, access_token):
+def recommend_similar_tracks(track_ids, access_token, weights=None, include_playlists=False, use_remote=True,
+                             limit=10):
+    """
+    Recommends tracks close to the seed tracks in audio-feature space, searched locally over the user's library.
+    Falls back to Spotify's /v1/recommendations endpoint if nothing is found locally and use_remote is set.
+    """
+    try:
+        seed_features = get_tracks_features(track_ids, access_token)
+        index = get_similarity_index(access_token, include_playlists)
+        similar = index.query(seed_features.values(), k=limit, weights=weights, exclude_ids=track_ids)
+        if similar:
+            return get_tracks([track_id for track_id, _ in similar], access_token)
+    except SpotifyAPIError as e:
+        st.warning(f"Local recommendations unavailable: {e}")
+
+    if use_remote:
+        return get_remote_recommendations(track_ids, access_token, limit)
+    return []
+
+
+def get_remote_recommendations(track_ids, access_token, limit=10):
     url = f"https://api.spotify.com/v1/recommendations"
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {
-        "seed_tracks": track_id,
-        "limit": 10
+        "seed_tracks": ",".join(track_ids[:5]),
+        "limit": limit
     }
-    response = requests.get(url, headers=headers, params=params)
+    response = http_client.get(url, headers=headers, params=params)
     if response.status_code == 200:
         recommendations = response.json().get('tracks', [])
         return recommendations
@@ -29,41 +106,39 @@ def recommend_similar_tracks(track_id, access_token):
 def display_recommendations():
     track_name = st.text_input("Enter track name for recommendations: ")
     artist_name = st.text_input("Enter artist name to correctly find the track")
+    include_playlists = st.checkbox("Also recommend tracks from my playlists")
+    use_remote = st.checkbox("Fall back to Spotify's recommendations when nothing similar is found", value=True)
+    with st.expander("Feature weights"):
+        weights = {feature: st.slider(feature.capitalize(), 0.0, 2.0, 1.0, 0.1) for feature in SIMILARITY_FEATURES}
     if st.button("Get Recommendations"):
         access_token = st.session_state['access_token']
-        track_id = get_track_id(track_name, artist_name, access_token)
+        track_id = get_track_id(track_name, artist_name, access_token, st.session_state)
         if not track_id or track_name == "":
+            st.session_state.pop(RECOMMENDATIONS_KEY, None)
             st.error("Track not found")
             return
-        recommendations = recommend_similar_tracks(track_id, access_token)
-        if recommendations:
-            for track in recommendations:
-                track_name = track['name']
-                artist_name = track['artists'][0]['name']
-                spotify_url = track['external_urls']['spotify']
-                st.markdown(f'**{track_name}** by {artist_name} <img src="https://upload.wikimedia.org/wikipedia/commons/thumb/8/84/Spotify_icon.svg/232px-Spotify_icon.svg.png" width="20"/> Play: <a href="{spotify_url}" target="_blank">Listen on Spotify</a>',
-                    unsafe_allow_html=True)
-        else:
-            st.error("No recommendations found.")
-
-
-def get_track_id(track_name, artist, access_token):
-    url = f"https://api.spotify.com/v1/search"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    params = {
-        "q": f"track: {track_name} artist: {artist}",
-        "type": "track",
-        "limit": 1
-    }
-    response = requests.get(url, headers=headers, params=params)
-    results = response.json().get('tracks', {}).get('items', [])
-    if results:
-        return results[0]['id']
-    else:
-        return None
+        with st.spinner("Finding similar tracks..."):
+            st.session_state[RECOMMENDATIONS_KEY] = recommend_similar_tracks([track_id], access_token, weights,
+                                                                             include_playlists, use_remote)
+
+    # Kept in the session so the add-to-playlist form still has them after its own button reruns the page
+    recommendations = st.session_state.get(RECOMMENDATIONS_KEY)
+    if recommendations is None:
+        return
+    if not recommendations:
+        st.error("No recommendations found.")
+        return
+    for track in recommendations:
+        track_name = track['name']
+        artist_name = track['artists'][0]['name']
+        spotify_url = track['external_urls']['spotify']
+        st.markdown(f'**{track_name}** by {artist_name} <img src="https://upload.wikimedia.org/wikipedia/commons/thumb/8/84/Spotify_icon.svg/232px-Spotify_icon.svg.png" width="20"/> Play: <a href="{spotify_url}" target="_blank">Listen on Spotify</a>',
+            unsafe_allow_html=True)
+
+    st.subheader("Add Recommendations to Playlists or Liked Songs")
+    labels = {track['id']: f"{track['name']} - {track['artists'][0]['name']}" for track in recommendations}
+    display_add_tracks_form(list(labels), "recommendations", labels)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
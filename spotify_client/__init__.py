@@ -0,0 +1 @@
+"""Shared Spotify helpers used by Home.py and the pages/ scripts."""
@@ -0,0 +1,46 @@
+"""Form for adding one or more tracks to any number of playlists and Liked Songs."""
+import streamlit as st
+
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.playlist_index import get_playlist_index
+from spotify_client.writes import LIKED_SONGS, add_tracks
+
+
+def display_add_tracks_form(track_ids, key, labels=None):
+    """
+    Renders the destination picker (and a track picker when there is more than one track) and adds the chosen
+    tracks to every chosen destination in one batched write. labels maps track IDs to display names;
+    key keeps the widgets of several forms on one page apart.
+    """
+    access_token = st.session_state['access_token']
+    try:
+        playlist_index = get_playlist_index(st.session_state, access_token)
+    except SpotifyAPIError:
+        st.error("Failed to fetch playlists. Please re-authenticate.")
+        return
+
+    labels = labels or {}
+    if len(track_ids) > 1:
+        chosen_tracks = st.multiselect("Tracks to add:", track_ids, default=track_ids, key=f"{key}_tracks",
+                                       format_func=lambda track_id: labels.get(track_id, track_id))
+    else:
+        chosen_tracks = list(track_ids)
+
+    def destination_name(option):
+        return option if option == LIKED_SONGS else playlist_index.name(option)
+
+    destinations = st.multiselect("Add to playlists or Liked Songs:", [LIKED_SONGS] + list(playlist_index.by_id),
+                                  key=f"{key}_destinations", format_func=destination_name)
+
+    if st.button("Add Tracks", key=f"{key}_add"):
+        if not chosen_tracks or not destinations:
+            st.error("Choose at least one track and one destination.")
+            return
+        with st.spinner("Adding tracks..."):
+            results = add_tracks(chosen_tracks, destinations, access_token)
+        for destination, result in results.items():
+            if result.ok:
+                playlist_index.update_snapshot(destination, result.snapshot_id)
+                st.success(f"Added {result.added} track(s) to {destination_name(destination)}.")
+            else:
+                st.error(f"Failed to add tracks to {destination_name(destination)}: {result.error}")
@@ -0,0 +1,21 @@
+"""Single Spotify Web API calls shared by the pages."""
+from spotify_client import http_client
+from spotify_client.pagination import API_URL
+
+
+def get_spotify_user_profile(access_token):
+    """Returns the current user's profile, or None if the token is invalid or expired."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = http_client.get(f"{API_URL}/me", headers=headers)
+    return response.json() if response.ok else None
+
+
+def create_playlist(user_id, name, description, public, access_token):
+    url = f"{API_URL}/users/{user_id}/playlists"
+    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+    data = {"name": name,
+            "description": description,
+            "public": public
+            }
+    response = http_client.post(url, headers=headers, json=data)
+    return response.json()
@@ -0,0 +1,106 @@
+"""
+Audio-feature charts and tables.
+
+plotly and pandas are imported lazily, so pages that never draw a chart don't pay for them.
+"""
+from spotify_client.startup import lazy_import
+
+pd = lazy_import("pandas")
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+
+CHART_FEATURES = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'liveness', 'speechiness']
+TABLE_FEATURES = CHART_FEATURES + ['tempo', 'loudness']
+
+
+def radar_chart_features(features):
+    data = [features[feat] for feat in CHART_FEATURES]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatterpolar(
+        r=data,
+        theta=CHART_FEATURES,
+        fill='toself',
+        name='Available Audio Features'
+    ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 1]
+            )),
+        showlegend=True
+    )
+    return fig
+
+
+def plotly_feature_chart(features):
+    features_df = pd.DataFrame([features])
+    features_df = features_df[CHART_FEATURES]
+    features_df = features_df.T.reset_index()
+    features_df.columns = ['Feature', 'Value']
+
+    fig = px.bar(features_df, x='Feature', y='Value', title="Audio Features",
+                 labels={'Value': 'Measure', 'Feature': 'Audio Feature'},
+                 color='Feature',
+                 height=400)
+    fig.update_layout(xaxis={'categoryorder':'total descending'})
+    return fig
+
+
+def radar_chart_features_multi(features_df):
+    """Overlays one radar trace per row of features_df (indexed by track label)."""
+    fig = go.Figure()
+    for label, row in features_df.iterrows():
+        fig.add_trace(go.Scatterpolar(
+            r=row[CHART_FEATURES].tolist(),
+            theta=CHART_FEATURES,
+            fill='toself',
+            name=label
+        ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 1]
+            )),
+        showlegend=True
+    )
+    return fig
+
+
+def plotly_feature_chart_multi(features_df):
+    """Grouped bar chart with one colour per row of features_df (indexed by track label)."""
+    features_df = features_df[CHART_FEATURES]
+    features_df = features_df.rename_axis('Track').reset_index().melt(id_vars='Track', var_name='Feature',
+                                                                      value_name='Value')
+
+    fig = px.bar(features_df, x='Feature', y='Value', title="Audio Features",
+                 labels={'Value': 'Measure', 'Feature': 'Audio Feature'},
+                 color='Track', barmode='group',
+                 height=400)
+    return fig
+
+
+def pie_chart_features(features):
+    labels = [feature.capitalize() for feature in CHART_FEATURES]
+    values = [features[feature] for feature in CHART_FEATURES]
+
+    fig = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.3)])
+    fig.update_layout(title_text='Audio Features Distribution')
+    return fig
+
+
+def feature_table(features):
+    """One column per track, one row per feature (the Numeric Table view)."""
+    return pd.DataFrame([features])[TABLE_FEATURES].T
+
+
+def play_count_chart(labels, counts, title):
+    """Bar chart of play counts, keeping the order of labels (hours, weekdays)."""
+    fig = px.bar(x=labels, y=counts, title=title, labels={'x': '', 'y': 'Plays'})
+    fig.update_xaxes(type='category')
+    return fig
@@ -0,0 +1,13 @@
+"""Thread pool that runs each task in a copy of the submitting thread's context."""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Drop-in ThreadPoolExecutor whose workers see the submitter's contextvars, so a task
+    keeps the caller's scheduler priority and its requests count towards the caller's rerun.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,51 @@
+"""Optional sidebar panel showing API call counts, latencies and cache hit ratios."""
+import os
+import time
+
+import streamlit as st
+
+from spotify_client.metrics import metrics
+from spotify_client.scheduler import get_scheduler
+from spotify_client.startup import startup_stats
+
+DEBUG_PANEL = os.environ.get("SPOTIFY_DEBUG_PANEL") == "1"
+
+
+def debug_panel_enabled():
+    return DEBUG_PANEL or st.query_params.get("debug") == "1"
+
+
+def display_debug_panel(rerun):
+    """Renders the panel for this rerun when enabled (SPOTIFY_DEBUG_PANEL=1 or ?debug=1)."""
+    if rerun is None or not debug_panel_enabled():
+        return
+    with st.sidebar.expander("API Debug"):
+        st.write(f"This rerun: {rerun.requests} API calls, {rerun.bytes / 1024:.1f} KiB, "
+                 f"{rerun.latency_sum:.2f}s in requests, {rerun.import_seconds:.2f}s in lazy imports, "
+                 f"{time.monotonic() - rerun.started_at:.2f}s total")
+        if rerun.by_endpoint:
+            st.dataframe([{"endpoint": endpoint, "calls": count} for endpoint, count in rerun.by_endpoint.items()],
+                         hide_index=True)
+
+        st.write("Since process start:")
+        rows = metrics.summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+
+        caches = metrics.cache_stats()
+        if caches:
+            st.dataframe([{"cache": name, "hits": stats["hits"], "misses": stats["misses"],
+                           "hit ratio": round(stats["hit_ratio"], 3),
+                           "MiB": round(stats["bytes"] / 2 ** 20, 2) if "bytes" in stats else None}
+                          for name, stats in caches.items()],
+                         hide_index=True)
+        st.write(get_scheduler().stats())
+
+        startup = startup_stats.snapshot()
+        if startup["cold_start"] is not None:
+            st.write(f"Cold start: {startup['cold_start']:.2f}s from process start to the first script run")
+        if startup["lazy_imports"]:
+            st.dataframe([{"module": name, "import s": round(seconds, 3)}
+                          for name, seconds in startup["lazy_imports"].items()], hide_index=True)
+        st.download_button("Download Prometheus metrics", metrics.prometheus_text(), "spotify_metrics.prom",
+                           "text/plain")
@@ -0,0 +1,72 @@
+"""Batched, cached and coalesced audio-features lookups."""
+from spotify_client import http_client
+from spotify_client.features_cache import get_features_cache
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.shared_cache import shared_cache
+from spotify_client.single_flight import request_key, single_flight
+
+AUDIO_FEATURES_URL = "https://api.spotify.com/v1/audio-features"
+BATCH_SIZE = 100
+FEATURES_NAMESPACE = "features"
+
+
+def _features_key(track_id):
+    return request_key(AUDIO_FEATURES_URL, {"ids": track_id})
+
+
+def get_tracks_features(track_ids, access_token, batch_size=BATCH_SIZE):
+    """
+    Fetches audio features for many tracks through the multi-ID endpoint, up to 100 IDs per request.
+    IDs already in the process-wide shared cache or in the on-disk features cache are served without an
+    API call, and IDs that another session is already fetching are waited for instead of being requested
+    again.
+    Returns a dict mapping track ID to its features; tracks without features are left out.
+    Raises SpotifyAPIError if a batch can't be fetched.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    unique_ids = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+
+    features = shared_cache.get_many(FEATURES_NAMESPACE, unique_ids)
+    cache = get_features_cache()
+    from_disk = cache.get_many([track_id for track_id in unique_ids if track_id not in features])
+    shared_cache.set_many(FEATURES_NAMESPACE, from_disk.items())
+    features.update(from_disk)
+    claimed = []
+    in_flight = {}
+    for track_id in unique_ids:
+        if track_id not in features:
+            future, leader = single_flight.claim(_features_key(track_id))
+            if leader:
+                claimed.append(track_id)
+            else:
+                in_flight[track_id] = future
+
+    # Resolve every ID this call claimed before waiting on anyone else's, so two callers can't wait on each other
+    unresolved = set(claimed)
+    try:
+        for i in range(0, len(claimed), batch_size):
+            batch_ids = claimed[i:i + batch_size]
+            response = http_client.get(AUDIO_FEATURES_URL, headers=headers, params={"ids": ",".join(batch_ids)})
+            if not response.ok:
+                raise SpotifyAPIError(response)
+            fetched = [item for item in response.json().get('audio_features') or [] if item]
+            cache.put_many(fetched)
+            shared_cache.set_many(FEATURES_NAMESPACE, ((item['id'], item) for item in fetched))
+            features.update((item['id'], item) for item in fetched)
+            for track_id in batch_ids:
+                single_flight.resolve(_features_key(track_id), features.get(track_id))
+                unresolved.discard(track_id)
+    except BaseException as e:
+        for track_id in unresolved:
+            single_flight.fail(_features_key(track_id), e)
+        raise
+
+    for track_id, future in in_flight.items():
+        item = future.result()
+        if item:
+            features[track_id] = item
+    return features
+
+
+def get_track_features(track_id, access_token):
+    return get_tracks_features([track_id], access_token).get(track_id)
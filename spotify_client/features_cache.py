@@ -0,0 +1,170 @@
+"""
+Persistent on-disk cache of Spotify audio features.
+
+Audio features for a track ID never change, so they are kept in a small SQLite
+database that every page and every session shares. Each feature is stored in its
+own REAL/INTEGER column, and a last_used timestamp drives LRU eviction once the
+table grows past max_entries.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from spotify_client.metrics import metrics
+
+CACHE_PATH = os.environ.get("FEATURES_CACHE_PATH", os.path.join(".cache", "audio_features.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.environ.get("FEATURES_CACHE_MAX_ENTRIES", "200000"))
+
+FEATURE_COLUMNS = (
+    ("danceability", "REAL"),
+    ("energy", "REAL"),
+    ("key", "INTEGER"),
+    ("loudness", "REAL"),
+    ("mode", "INTEGER"),
+    ("speechiness", "REAL"),
+    ("acousticness", "REAL"),
+    ("instrumentalness", "REAL"),
+    ("liveness", "REAL"),
+    ("valence", "REAL"),
+    ("tempo", "REAL"),
+    ("duration_ms", "INTEGER"),
+    ("time_signature", "INTEGER"),
+)
+FEATURE_NAMES = [name for name, _ in FEATURE_COLUMNS]
+
+# SQLite limits the number of bound parameters per statement.
+_SQL_BATCH = 500
+
+
+class FeaturesCache:
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(f"{name} {kind}" for name, kind in FEATURE_COLUMNS)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS audio_features "
+                f"(track_id TEXT PRIMARY KEY, {columns}, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS audio_features_last_used ON audio_features (last_used)"
+            )
+
+    def get(self, track_id):
+        return self.get_many([track_id]).get(track_id)
+
+    def get_many(self, track_ids):
+        """
+        Returns a dict of track ID -> features for the IDs that are cached.
+        Missing IDs are simply left out of the result.
+        """
+        track_ids = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(track_ids), _SQL_BATCH):
+                batch_ids = track_ids[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch_ids))
+                rows = self._conn.execute(
+                    f"SELECT track_id, {', '.join(FEATURE_NAMES)} FROM audio_features "
+                    f"WHERE track_id IN ({placeholders})",
+                    batch_ids,
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = _row_to_features(row)
+            if found:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE audio_features SET last_used = ? WHERE track_id = ?",
+                        [(now, track_id) for track_id in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(track_ids) - len(found)
+        return found
+
+    def put(self, features):
+        self.put_many([features])
+
+    def put_many(self, features_list):
+        """
+        Stores audio-features objects as returned by the API (None entries are skipped),
+        then evicts the least recently used rows if the cache is over its size cap.
+        """
+        now = time.time()
+        rows = [
+            (features['id'], *[features.get(name) for name in FEATURE_NAMES], now)
+            for features in features_list if features and features.get('id')
+        ]
+        if not rows:
+            return
+        placeholders = ",".join("?" * (len(FEATURE_NAMES) + 2))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO audio_features "
+                f"(track_id, {', '.join(FEATURE_NAMES)}, last_used) VALUES ({placeholders})",
+                rows,
+            )
+            self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM audio_features").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM audio_features WHERE track_id IN "
+                "(SELECT track_id FROM audio_features ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM audio_features").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM audio_features")
+            self.hits = 0
+            self.misses = 0
+
+
+def _row_to_features(row):
+    track_id = row[0]
+    features = dict(zip(FEATURE_NAMES, row[1:]))
+    features.update({
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "type": "audio_features",
+    })
+    return features
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_features_cache():
+    """Returns the process-wide cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FeaturesCache()
+                metrics.register_cache("features", _cache.stats)
+    return _cache
@@ -0,0 +1,204 @@
+"""
+Incremental listening history.
+
+/me/player/recently-played only ever returns the last 50 plays, so the history is
+collected as it happens: every poll asks only for plays after the newest one
+already stored (the `after` cursor) and appends them to the user's store.
+
+Each user's store is a directory of append-only segments, one .npz per poll with
+played_at (Unix ms), track ID, name, artist and a float32 audio-feature matrix,
+plus aggregates.json with the cursor and running aggregates: plays per artist,
+per hour of day and weekday (UTC), per date, and the sums behind the mean feature
+profile. Pages only read aggregates.json, so showing long-term statistics costs
+the same however long the history gets. If it goes missing, it is rebuilt from
+the segments.
+"""
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from spotify_client import http_client
+from spotify_client.features_cache import FEATURE_NAMES
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.pagination import API_URL
+from spotify_client.records import track_record
+from spotify_client.single_flight import single_flight
+from spotify_client.startup import lazy_import
+
+np = lazy_import("numpy")
+
+HISTORY_DIR = os.environ.get("HISTORY_CACHE_DIR", os.path.join(".cache", "history"))
+RECENTLY_PLAYED_URL = f"{API_URL}/me/player/recently-played"
+PAGE_SIZE = 50
+POLL_INTERVAL = 60
+
+SEGMENT_COLUMNS = ("played_at", "track_ids", "names", "artists", "features")
+
+
+def played_at_ms(played_at):
+    """Unix milliseconds for a played_at timestamp such as 2024-05-01T12:34:56.789Z."""
+    parsed = datetime.fromisoformat(played_at.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _empty_aggregates():
+    return {
+        "feature_names": FEATURE_NAMES,
+        "after": 0,
+        "polled_at": None,
+        "plays": 0,
+        "first_played_at": None,
+        "artists": {},
+        "hours": [0] * 24,
+        "weekdays": [0] * 7,
+        "dates": {},
+        "feature_sums": [0.0] * len(FEATURE_NAMES),
+        "feature_counts": [0] * len(FEATURE_NAMES),
+    }
+
+
+class ListeningHistory:
+    def __init__(self, user_id, aggregates=None):
+        self.user_id = user_id
+        self.aggregates = aggregates or _empty_aggregates()
+
+    def __len__(self):
+        return self.aggregates["plays"]
+
+    @staticmethod
+    def directory(user_id):
+        return os.path.join(HISTORY_DIR, re.sub(r"[^A-Za-z0-9_-]", "_", user_id))
+
+    @classmethod
+    def load(cls, user_id):
+        """Loads the user's aggregates, rebuilding them from the segments if needed."""
+        try:
+            with open(os.path.join(cls.directory(user_id), "aggregates.json")) as f:
+                aggregates = json.load(f)
+        except (OSError, ValueError):
+            return cls.rebuild(user_id)
+        if aggregates.get("feature_names") != FEATURE_NAMES:
+            return cls.rebuild(user_id)
+        return cls(user_id, aggregates)
+
+    @classmethod
+    def rebuild(cls, user_id):
+        history = cls(user_id)
+        for path in sorted(glob.glob(os.path.join(cls.directory(user_id), "segment-*.npz"))):
+            with np.load(path) as segment:
+                columns = {name: segment[name] for name in SEGMENT_COLUMNS}
+            if columns["features"].shape[1:] != (len(FEATURE_NAMES),):
+                columns["features"] = np.full((len(columns["played_at"]), len(FEATURE_NAMES)), np.nan,
+                                              dtype=np.float32)
+            history._aggregate(columns["played_at"].tolist(), columns["artists"].tolist(), columns["features"])
+        return history
+
+    def append(self, played_at, track_ids, names, artists, features):
+        """Writes one segment of plays (oldest first) and folds it into the aggregates."""
+        if not played_at:
+            return
+        directory = self.directory(self.user_id)
+        os.makedirs(directory, exist_ok=True)
+        # Named after its first play, so a segment re-fetched after a crash replaces itself
+        path = os.path.join(directory, f"segment-{played_at[0]}.npz")
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, played_at=np.asarray(played_at, dtype=np.int64), track_ids=np.asarray(track_ids, dtype=str),
+                     names=np.asarray(names, dtype=str), artists=np.asarray(artists, dtype=str), features=features)
+        os.replace(path + ".tmp", path)
+        self._aggregate(played_at, artists, features)
+
+    def _aggregate(self, played_at, artists, features):
+        aggregates = self.aggregates
+        for played, artist in zip(played_at, artists):
+            moment = datetime.fromtimestamp(played / 1000, timezone.utc)
+            aggregates["artists"][artist] = aggregates["artists"].get(artist, 0) + 1
+            aggregates["hours"][moment.hour] += 1
+            aggregates["weekdays"][moment.weekday()] += 1
+            date = moment.date().isoformat()
+            aggregates["dates"][date] = aggregates["dates"].get(date, 0) + 1
+        known = ~np.isnan(features)
+        aggregates["feature_sums"] = [total + float(added) for total, added in
+                                      zip(aggregates["feature_sums"], np.where(known, features, 0).sum(axis=0))]
+        aggregates["feature_counts"] = [count + int(added) for count, added in
+                                        zip(aggregates["feature_counts"], known.sum(axis=0))]
+        aggregates["plays"] += len(played_at)
+        aggregates["after"] = max(aggregates["after"], max(played_at))
+        if aggregates["first_played_at"] is None:
+            aggregates["first_played_at"] = min(played_at)
+
+    def save(self):
+        directory = self.directory(self.user_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "aggregates.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.aggregates, f)
+        os.replace(path + ".tmp", path)
+
+    def top_artists(self, count=10):
+        return sorted(self.aggregates["artists"].items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def mean_features(self):
+        """Mean audio features over every play with known features; None before there are any."""
+        sums, counts = self.aggregates["feature_sums"], self.aggregates["feature_counts"]
+        if not any(counts):
+            return None
+        return {name: total / count if count else 0.0 for name, total, count in zip(FEATURE_NAMES, sums, counts)}
+
+
+def fetch_plays_after(access_token, after):
+    """Returns (played_at_ms, TrackRecord) pairs played after `after` (Unix ms), oldest first."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    plays = {}
+    while True:
+        response = http_client.get(RECENTLY_PLAYED_URL, headers=headers, params={"limit": PAGE_SIZE, "after": after})
+        if not response.ok:
+            raise SpotifyAPIError(response)
+        items = response.json().get('items') or []
+        for item in items:
+            record = track_record(item)
+            played = played_at_ms(item['played_at'])
+            if record is not None and played > after:
+                plays[played] = record
+        if len(items) < PAGE_SIZE or not plays or max(plays) <= after:
+            break
+        after = max(plays)
+    return sorted(plays.items(), key=lambda play: play[0])
+
+
+def _collect(user_id, access_token, fetch_features, min_interval):
+    history = ListeningHistory.load(user_id)
+    polled_at = history.aggregates["polled_at"]
+    if polled_at is not None and time.time() - polled_at < min_interval:
+        return history
+
+    plays = fetch_plays_after(access_token, history.aggregates["after"])
+    records = [record for _, record in plays]
+    track_ids = [record.id for record in records if record.id]
+    features_by_id = fetch_features(track_ids) if track_ids else {}
+    features = np.full((len(records), len(FEATURE_NAMES)), np.nan, dtype=np.float32)
+    for i, record in enumerate(records):
+        track_features = features_by_id.get(record.id)
+        if track_features:
+            features[i] = [np.nan if track_features.get(name) is None else track_features[name]
+                           for name in FEATURE_NAMES]
+    history.append([played for played, _ in plays], [record.id or "" for record in records],
+                   [record.name for record in records], [record.artist for record in records], features)
+    history.aggregates["polled_at"] = time.time()
+    history.save()
+    return history
+
+
+def collect_history(user_id, access_token, fetch_features, min_interval=POLL_INTERVAL):
+    """
+    Appends the user's plays since the last poll to their history and returns it.
+    Polls at most every min_interval seconds; concurrent calls for one user share a single poll.
+    fetch_features(track_ids) -> dict joins audio features for the new plays.
+    Raises SpotifyAPIError if Spotify can't be reached.
+    """
+    return single_flight.do(("listening_history", user_id),
+                            lambda: _collect(user_id, access_token, fetch_features, min_interval))
@@ -0,0 +1,188 @@
+"""
+Conditional-request cache for GET responses.
+
+Responses from the endpoints listed in FRESHNESS are kept per (URL, query, access
+token) together with their ETag. Within an endpoint's freshness window the cached
+response is returned without any request; after it, the request goes out with
+If-None-Match and a 304 answer is served from the cached body. Endpoints that
+aren't listed are never cached, and neither is anything but a 200.
+
+Item pages of the endpoints in PROJECTED_PAGES (playlist tracks) can be hundreds
+of KB each, and the app only ever reads them through a projection such as
+records.track_record. get_page() keeps just the ETag and the projected page, so
+no raw item JSON is cached; every use is revalidated.
+
+Entries are stored in the process-wide shared cache (spotify_client.shared_cache)
+under the endpoint's namespace in NAMESPACES, so they count towards its memory
+budget and, with a shared backend configured, are revalidated by every replica.
+"""
+import copy
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from spotify_client.metrics import metrics
+from spotify_client.scheduler import endpoint_key
+from spotify_client.shared_cache import shared_cache
+
+# Seconds a cached response is used without asking Spotify at all. With 0 every use is revalidated,
+# which still turns an unchanged response into a bodiless 304.
+# /v1/me is kept short since page entry checks it to see whether the token still works. Top items are
+# revalidated every time: the Profile page keeps its own copy for a few minutes, and its Refresh must reach Spotify.
+FRESHNESS = {
+    "/v1/me": 30,
+    "/v1/me/playlists": 0,
+    "/v1/users/{id}/playlists": 0,
+    "/v1/me/top/tracks": 0,
+    "/v1/me/top/artists": 0,
+}
+
+# Shared-cache namespace of each cached endpoint
+NAMESPACES = {
+    "/v1/me": "profile",
+    "/v1/me/playlists": "playlists",
+    "/v1/users/{id}/playlists": "playlists",
+    "/v1/me/top/tracks": "top_items",
+    "/v1/me/top/artists": "top_items",
+}
+
+# Paged endpoints cached only after projection, and their shared-cache namespace
+PROJECTED_PAGES = {
+    "/v1/playlists/{id}/tracks": "playlists",
+}
+
+
+class CachedPage:
+    def __init__(self, etag, page):
+        self.etag = etag
+        self.page = page
+
+    def copy_page(self):
+        return dict(self.page, items=list(self.page['items']))
+
+
+class CachedResponse:
+    def __init__(self, response):
+        self.etag = response.headers.get("ETag")
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.content = response.content
+        # Wall-clock time, since entries may come from another replica's backend
+        self.stored_at = time.time()
+
+    def to_response(self, url):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = url
+        response.from_cache = True
+        return response
+
+
+class HTTPCache:
+    def __init__(self, freshness=None, namespaces=None, cache=shared_cache):
+        self.freshness = dict(FRESHNESS if freshness is None else freshness)
+        self.namespaces = dict(NAMESPACES if namespaces is None else namespaces)
+        self.cache = cache
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def cacheable(self, url):
+        return endpoint_key(url) in self.freshness
+
+    @staticmethod
+    def key(url, params=None, headers=None):
+        """Cache key; the access token is hashed in so users never see each other's responses."""
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        authorization = (headers or {}).get("Authorization", "")
+        return url, query, hashlib.sha256(authorization.encode()).hexdigest()
+
+    def get(self, url, kwargs, send):
+        """
+        Returns the response for a GET of url, using the cache where possible.
+        send(kwargs) performs the actual request (with retries) and returns a requests.Response.
+        """
+        endpoint = endpoint_key(url)
+        namespace = self.namespaces.get(endpoint, "http")
+        key = self.key(url, kwargs.get("params"), kwargs.get("headers"))
+        entry = self.cache.get(namespace, key, None)
+        if entry is not None and time.time() - entry.stored_at < self.freshness[endpoint]:
+            with self._lock:
+                self.hits += 1
+            return entry.to_response(url)
+
+        if entry is not None and entry.etag:
+            kwargs = dict(kwargs, headers=dict(kwargs.get("headers") or {}, **{"If-None-Match": entry.etag}))
+        response = send(kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            # Cached values are shared, so store a refreshed copy instead of touching this one
+            refreshed = copy.copy(entry)
+            refreshed.stored_at = time.time()
+            refreshed.etag = response.headers.get("ETag", entry.etag)
+            self.cache.set(namespace, key, refreshed)
+            return refreshed.to_response(url)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200 and (response.headers.get("ETag") or self.freshness[endpoint]):
+            self.cache.set(namespace, key, CachedResponse(response))
+        return response
+
+    def projects(self, url):
+        return endpoint_key(url) in PROJECTED_PAGES
+
+    def get_page(self, url, kwargs, send, project):
+        """
+        GETs a page of a PROJECTED_PAGES endpoint and returns (response, page), where page is the parsed body
+        with its items mapped through project (None results dropped), or None if the response isn't ok.
+        An unchanged page is answered with a 304 and served from the cached projection.
+        """
+        namespace = PROJECTED_PAGES[endpoint_key(url)]
+        projection = f"{project.__module__}.{project.__qualname__}"
+        key = self.key(url, kwargs.get("params"), kwargs.get("headers")) + (projection,)
+        entry = self.cache.get(namespace, key, None)
+        if entry is not None:
+            kwargs = dict(kwargs, headers=dict(kwargs.get("headers") or {}, **{"If-None-Match": entry.etag}))
+        response = send(kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            return response, entry.copy_page()
+
+        with self._lock:
+            self.misses += 1
+        if not response.ok:
+            return response, None
+        page = response.json()
+        page['items'] = [record for record in map(project, page.get('items') or []) if record is not None]
+        if response.headers.get("ETag"):
+            entry = CachedPage(response.headers["ETag"], page)
+            self.cache.set(namespace, key, entry)
+            return response, entry.copy_page()
+        return response, page
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.revalidated + self.misses
+            return {
+                "hits": self.hits + self.revalidated,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.revalidated) / total if total else 0.0,
+                "fresh_hits": self.hits,
+                "revalidated": self.revalidated,
+            }
+
+
+http_cache = HTTPCache()
+metrics.register_cache("http", http_cache.stats)
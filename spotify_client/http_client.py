@@ -0,0 +1,178 @@
+"""
+Pooled HTTP client shared by every page.
+
+All Spotify calls go through one requests.Session so TLS connections are reused
+across calls, reruns and sessions. Requests get a default timeout, 429 responses
+are retried after the Retry-After delay, and 5xx responses / connection errors on
+idempotent methods are retried with exponential backoff and jitter. Profile and
+playlist GETs are answered from spotify_client.http_cache when still fresh, and
+revalidated with If-None-Match otherwise.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from spotify_client.http_cache import http_cache
+from spotify_client.metrics import metrics
+from spotify_client.scheduler import endpoint_key, get_scheduler
+
+DEFAULT_TIMEOUT = (3.05, 20)
+MAX_RETRIES = int(os.environ.get("SPOTIFY_HTTP_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_AFTER_MAX = 30.0
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = int(os.environ.get("SPOTIFY_HTTP_POOL_MAXSIZE", "32"))
+
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+class SpotifyAPIError(Exception):
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} - {response.text}")
+        self.response = response
+        self.status_code = response.status_code
+
+
+# URL prefix -> replacement, e.g. to point the app at a local fake API when benchmarking
+_url_rewrites = {}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def redirect(prefix, target):
+    """Sends every request whose URL starts with prefix to target instead."""
+    _url_rewrites[prefix] = target
+
+
+def _rewrite(url):
+    for prefix, target in _url_rewrites.items():
+        if url.startswith(prefix):
+            return target + url[len(prefix):]
+    return url
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given (zero-based) retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_after_seconds(response):
+    """The response's Retry-After header in seconds (capped at RETRY_AFTER_MAX), or None if it has none."""
+    try:
+        delay = float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+    return min(max(delay, 0.0), RETRY_AFTER_MAX)
+
+
+def retry_after_delay(response, attempt):
+    """Seconds to wait after a 429, taken from Retry-After when the server sends one."""
+    delay = retry_after_seconds(response)
+    return backoff_delay(attempt) if delay is None else delay
+
+
+def _send(session, method, url, kwargs):
+    """One attempt: waits for a scheduler slot, then sends the request and records its metrics."""
+    endpoint = endpoint_key(url)
+    with get_scheduler().slot(url) as report:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.record(method, endpoint, "error", 0, time.perf_counter() - started)
+            raise
+        metrics.record(method, endpoint, response.status_code, len(response.content), time.perf_counter() - started)
+        report(response.status_code, retry_after_seconds(response) if response.status_code == 429 else None)
+    return response
+
+
+def request(method, url, max_retries=MAX_RETRIES, **kwargs):
+    """
+    Sends a request through the shared session and returns the final requests.Response.
+    Non-idempotent requests (e.g. POST) are only retried on 429, since a 5xx may already have been applied.
+    Every attempt waits for a slot from the process-wide scheduler, which also learns from its status code.
+    GETs of the endpoints in http_cache.FRESHNESS go through the conditional-request cache.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    url = _rewrite(url)
+    method = method.upper()
+    if method == "GET" and http_cache.cacheable(url):
+        return http_cache.get(url, kwargs, lambda cache_kwargs: _request(method, url, max_retries, cache_kwargs))
+    return _request(method, url, max_retries, kwargs)
+
+
+def _request(method, url, max_retries, kwargs):
+    idempotent = method in IDEMPOTENT_METHODS
+    session = get_session()
+
+    attempt = 0
+    while True:
+        try:
+            response = _send(session, method, url, kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if not idempotent or attempt >= max_retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        if attempt >= max_retries:
+            return response
+        if response.status_code == 429:
+            delay = retry_after_delay(response, attempt)
+        elif response.status_code in RETRY_STATUSES and idempotent:
+            delay = backoff_delay(attempt)
+        else:
+            return response
+
+        response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def get_page(url, project, max_retries=MAX_RETRIES, **kwargs):
+    """
+    GETs a page of one of http_cache.PROJECTED_PAGES and returns (response, page) with the page's items mapped
+    through project; page is None if the response isn't ok. Only the projection is cached, never the raw body.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    url = _rewrite(url)
+    return http_cache.get_page(url, kwargs, lambda cache_kwargs: _request("GET", url, max_retries, cache_kwargs),
+                               project)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
@@ -0,0 +1,275 @@
+"""
+Local per-user snapshot of the liked-songs library.
+
+Each user's library lives in its own directory as plain .npy column files (track
+IDs, names, artists, added_at and a float32 audio-feature matrix) that are loaded
+memory-mapped. Every save writes its columns into a new version directory and
+then atomically replaces meta.json, which names the current version, so a reader
+never sees columns from two different saves. Concurrent syncs of one user in this
+process share a single sync.
+
+/me/tracks is returned newest first, so a sync only reads pages until it reaches
+a track that is already in the snapshot. If Spotify's `total` then says tracks
+were removed, they are located by bisecting over pages (see _find_removed), which
+costs a few pages per removed track instead of a full download. Only when the
+library doesn't line up with the snapshot (local files, a concurrent reorder) is
+the snapshot rebuilt from a full (concurrent) download.
+"""
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from spotify_client.features_cache import FEATURE_NAMES
+from spotify_client.pagination import API_URL, fetch_page, iter_saved_track_records
+from spotify_client.records import track_record
+from spotify_client.scheduler import background
+from spotify_client.single_flight import single_flight
+from spotify_client.startup import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+LIBRARY_DIR = os.environ.get("LIBRARY_CACHE_DIR", os.path.join(".cache", "library"))
+PAGE_SIZE = 50
+
+COLUMNS = ("track_ids", "names", "artists", "added_at", "features")
+
+# Superseded version directories are removed once they are this old, so a save running
+# in another process isn't deleted from under it
+STALE_VERSION_SECONDS = 600
+
+
+class LibrarySnapshot:
+    def __init__(self, user_id, track_ids=(), names=(), artists=(), added_at=(), features=None, synced_at=None):
+        self.user_id = user_id
+        self.track_ids = np.asarray(track_ids, dtype=str)
+        self.names = np.asarray(names, dtype=str)
+        self.artists = np.asarray(artists, dtype=str)
+        self.added_at = np.asarray(added_at, dtype=str)
+        if features is None:
+            features = np.full((len(self.track_ids), len(FEATURE_NAMES)), np.nan, dtype=np.float32)
+        self.features = features
+        self.synced_at = synced_at
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    @property
+    def last_added_at(self):
+        return self.added_at[0] if len(self.added_at) else None
+
+    @staticmethod
+    def directory(user_id):
+        return os.path.join(LIBRARY_DIR, re.sub(r"[^A-Za-z0-9_-]", "_", user_id))
+
+    @classmethod
+    def load(cls, user_id):
+        """Loads the user's snapshot memory-mapped, or returns None if there isn't one yet."""
+        directory = cls.directory(user_id)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            # Snapshots saved before versioning keep their columns next to meta.json
+            column_dir = os.path.join(directory, meta["version"]) if meta.get("version") else directory
+            columns = {name: np.load(os.path.join(column_dir, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        except (OSError, ValueError):
+            return None
+        if meta.get("feature_names") != FEATURE_NAMES:
+            return None
+        if len({len(column) for column in columns.values()}) != 1:
+            return None
+        return cls(user_id, synced_at=meta.get("synced_at"), **columns)
+
+    def save(self):
+        directory = self.directory(self.user_id)
+        version = f"v-{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.join(directory, version))
+        for name in COLUMNS:
+            np.save(os.path.join(directory, version, f"{name}.npy"), np.asarray(getattr(self, name)))
+        meta = {"version": version, "synced_at": self.synced_at, "count": len(self), "feature_names": FEATURE_NAMES}
+        meta_tmp = os.path.join(directory, f"meta.json.{version}.tmp")
+        with open(meta_tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_tmp, os.path.join(directory, "meta.json"))
+        _remove_stale_versions(directory, version)
+
+    def feature_frame(self):
+        """Audio features as a DataFrame indexed by track ID, in library order (newest first)."""
+        frame = pd.DataFrame(np.asarray(self.features), index=pd.Index(self.track_ids, name="id"),
+                             columns=FEATURE_NAMES)
+        return frame.dropna(how="all")
+
+
+def _remove_stale_versions(directory, current):
+    for name in COLUMNS:
+        # Columns of a snapshot saved before versioning
+        if os.path.exists(os.path.join(directory, f"{name}.npy")):
+            os.remove(os.path.join(directory, f"{name}.npy"))
+    cutoff = time.time() - STALE_VERSION_SECONDS
+    for entry in os.scandir(directory):
+        if entry.name.startswith("v-") and entry.name != current and entry.is_dir() \
+                and entry.stat().st_mtime < cutoff:
+            # Open memory maps keep their data on POSIX; on Windows the directory is retried next save
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def has_snapshot(user_id):
+    return os.path.exists(os.path.join(LibrarySnapshot.directory(user_id), "meta.json"))
+
+
+def snapshot_version(user_id):
+    """Names the user's current snapshot (a new name with every save) without loading it; None if there is none."""
+    try:
+        with open(os.path.join(LibrarySnapshot.directory(user_id), "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta.get("version") or meta.get("synced_at")
+
+
+def _rows(records):
+    """(id, name, artist, added_at) rows for the snapshot; local files have no ID and are skipped."""
+    return [(record.id, record.name, record.artist, record.added_at) for record in records if record.id]
+
+
+def _feature_matrix(track_ids, fetch_features):
+    features_by_id = fetch_features(list(track_ids)) if len(track_ids) else {}
+    matrix = np.full((len(track_ids), len(FEATURE_NAMES)), np.nan, dtype=np.float32)
+    for i, track_id in enumerate(track_ids):
+        features = features_by_id.get(track_id)
+        if features:
+            matrix[i] = [np.nan if features.get(name) is None else features[name] for name in FEATURE_NAMES]
+    return matrix
+
+
+def _build(user_id, rows, features):
+    track_ids, names, artists, added_at = zip(*rows) if rows else ((), (), (), ())
+    return LibrarySnapshot(user_id, track_ids, names, artists, added_at, features, synced_at=time.time())
+
+
+def full_sync(user_id, access_token, fetch_features):
+    rows = []
+    # A full download is a bulk scan: let other users' interactive requests go first
+    with background():
+        for page in iter_saved_track_records(access_token):
+            rows.extend(_rows(page))
+    snapshot = _build(user_id, rows, _feature_matrix([row[0] for row in rows], fetch_features))
+    snapshot.save()
+    return snapshot
+
+
+def sync_library(user_id, access_token, fetch_features):
+    """
+    Brings the user's local snapshot up to date and returns it.
+    fetch_features(track_ids) -> dict is used to join audio features for new tracks only.
+    Concurrent calls for the same user (e.g. the login warm-up and a page) share one sync.
+    Raises SpotifyAPIError if Spotify can't be reached.
+    """
+    return single_flight.do(("library", user_id), lambda: _sync(user_id, access_token, fetch_features))
+
+
+def _sync(user_id, access_token, fetch_features):
+    snapshot = LibrarySnapshot.load(user_id)
+    if snapshot is None or not len(snapshot):
+        return full_sync(user_id, access_token, fetch_features)
+
+    known_ids = set(snapshot.track_ids.tolist())
+    last_added_at = snapshot.last_added_at
+    new_rows = []
+    offset = 0
+    total = 0
+    reached_known = False
+    while not reached_known:
+        page = fetch_page(f"{API_URL}/me/tracks", access_token, offset, PAGE_SIZE, project=track_record)
+        total = page.get('total') or 0
+        for row in _rows(page['items']):
+            if row[0] in known_ids and row[3] <= last_added_at:
+                reached_known = True
+                break
+            new_rows.append(row)
+        offset += PAGE_SIZE
+        if offset >= total:
+            break
+
+    # Re-saved tracks move to the top, so drop their old position
+    new_ids = [row[0] for row in new_rows]
+    keep = ~np.isin(snapshot.track_ids, new_ids)
+    expected_ids = new_ids + snapshot.track_ids[keep].tolist()
+    removed = set()
+    if total != len(expected_ids):
+        removed = _find_removed(expected_ids, total, access_token) if total < len(expected_ids) else None
+        if removed is None:
+            # The library doesn't line up with the snapshot: rebuild (features come from the cache)
+            return full_sync(user_id, access_token, fetch_features)
+    if not new_rows and not removed:
+        return snapshot
+
+    old_rows = list(zip(snapshot.track_ids[keep].tolist(), snapshot.names[keep].tolist(),
+                        snapshot.artists[keep].tolist(), snapshot.added_at[keep].tolist()))
+    features = np.concatenate([_feature_matrix(new_ids, fetch_features), np.asarray(snapshot.features)[keep]])
+    present = np.ones(len(expected_ids), dtype=bool)
+    present[list(removed)] = False
+    rows = [row for row, is_present in zip(new_rows + old_rows, present) if is_present]
+    snapshot = _build(user_id, rows, features[present])
+    snapshot.save()
+    return snapshot
+
+
+class _Misaligned(Exception):
+    pass
+
+
+def _find_removed(expected_ids, total, access_token):
+    """
+    Returns the positions in expected_ids (the library as the snapshot knows it, newest first) of the tracks
+    that are no longer saved, or None if the library doesn't line up with expected_ids.
+
+    /me/tracks keeps its order, so the first track of page p sits at expected position p * PAGE_SIZE + the
+    number of tracks removed before it. That count only grows from page to page, and pages are only fetched
+    where it changes: about log2(pages) fetches per removed track.
+    """
+    if total == 0:
+        return set(range(len(expected_ids)))
+    position = {track_id: i for i, track_id in enumerate(expected_ids)}
+    pages = {}
+
+    def positions(number):
+        if number not in pages:
+            page = fetch_page(f"{API_URL}/me/tracks", access_token, number * PAGE_SIZE, PAGE_SIZE,
+                              project=track_record)
+            ids = [record.id for record in page['items']]
+            if not ids or (page.get('total') or 0) != total or any(track_id not in position for track_id in ids):
+                raise _Misaligned
+            page_positions = [position[track_id] for track_id in ids]
+            if any(a >= b for a, b in zip(page_positions, page_positions[1:])):
+                raise _Misaligned
+            pages[number] = page_positions
+        return pages[number]
+
+    def removed_before(number):
+        return positions(number)[0] - number * PAGE_SIZE
+
+    removed = set()
+
+    def bisect(low, high):
+        """Collects the removals from the start of page low up to the start of page high."""
+        if removed_before(low) == removed_before(high):
+            return
+        if high - low == 1:
+            removed.update(set(range(positions(low)[0], positions(high)[0])) - set(positions(low)))
+            return
+        middle = (low + high) // 2
+        bisect(low, middle)
+        bisect(middle, high)
+
+    last_page = (total - 1) // PAGE_SIZE
+    try:
+        removed.update(range(removed_before(0)))
+        bisect(0, last_page)
+        removed.update(set(range(positions(last_page)[0], len(expected_ids))) - set(positions(last_page)))
+    except _Misaligned:
+        return None
+    return removed if len(expected_ids) - len(removed) == total else None
@@ -0,0 +1,213 @@
+"""
+Request instrumentation for the HTTP layer.
+
+http_client reports every attempt here: per (method, endpoint) request counts by
+status, response bytes and a latency histogram. Requests are also added to the
+current rerun's totals when a page has called start_rerun() (worker threads
+started through ContextThreadPoolExecutor count towards their page's rerun).
+Caches register a stats() callable so their hit ratios show up next to the
+request numbers. Everything can be dumped in the Prometheus text format, and
+served over HTTP when SPOTIFY_METRICS_PORT is set, together with the cold start
+and lazy import times from spotify_client.startup.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from spotify_client.startup import startup_stats
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PORT = os.environ.get("SPOTIFY_METRICS_PORT")
+
+
+class EndpointStats:
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def count(self):
+        return sum(self.statuses.values())
+
+    def record(self, status, size, latency):
+        self.statuses[status] += 1
+        self.bytes += size
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, q):
+        """Upper bound of the histogram bucket holding the q-th quantile (inf for the overflow bucket)."""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.buckets):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return 0.0
+
+
+class RerunStats:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.by_endpoint = defaultdict(int)
+        self.import_seconds = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.endpoints = defaultdict(EndpointStats)
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, endpoint, status, size, latency):
+        with self._lock:
+            self.endpoints[(method, endpoint)].record(status, size, latency)
+            rerun = _current_rerun.get()
+            if rerun is not None:
+                rerun.requests += 1
+                rerun.bytes += size
+                rerun.latency_sum += latency
+                rerun.by_endpoint[f"{method} {endpoint}"] += 1
+
+    def register_cache(self, name, stats):
+        """stats is a callable returning a dict with at least `hits` and `misses`."""
+        self.caches[name] = stats
+
+    def cache_stats(self):
+        return {name: stats() for name, stats in self.caches.items()}
+
+    def snapshot(self):
+        with self._lock:
+            return {key: (dict(stats.statuses), stats.bytes, stats.latency_sum, list(stats.buckets))
+                    for key, stats in self.endpoints.items()}
+
+    def summary(self):
+        """One row per (method, endpoint): calls, errors, bytes, mean and p95 latency in milliseconds."""
+        with self._lock:
+            rows = []
+            for (method, endpoint), stats in sorted(self.endpoints.items()):
+                rows.append({
+                    "endpoint": f"{method} {endpoint}",
+                    "calls": stats.count,
+                    "errors": sum(count for status, count in stats.statuses.items()
+                                  if status == "error" or status >= 400),
+                    "KiB": round(stats.bytes / 1024, 1),
+                    "avg ms": round(1000 * stats.latency_sum / stats.count, 1) if stats.count else 0.0,
+                    "p95 ms ≤": 1000 * stats.percentile(0.95),
+                })
+            return rows
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP spotify_api_requests_total Spotify API requests by endpoint and status.",
+            "# TYPE spotify_api_requests_total counter",
+        ]
+        snapshot = sorted(self.snapshot().items())
+        for (method, endpoint), (statuses, _, _, _) in snapshot:
+            # Connection errors are recorded as "error" next to integer HTTP statuses
+            for status, count in sorted(statuses.items(), key=lambda item: str(item[0])):
+                lines.append(f'spotify_api_requests_total{{method="{method}",endpoint="{endpoint}",'
+                             f'status="{status}"}} {count}')
+        lines += [
+            "# HELP spotify_api_response_bytes_total Response body bytes received.",
+            "# TYPE spotify_api_response_bytes_total counter",
+        ]
+        for (method, endpoint), (_, size, _, _) in snapshot:
+            lines.append(f'spotify_api_response_bytes_total{{method="{method}",endpoint="{endpoint}"}} {size}')
+        lines += [
+            "# HELP spotify_api_request_duration_seconds Spotify API request latency.",
+            "# TYPE spotify_api_request_duration_seconds histogram",
+        ]
+        for (method, endpoint), (statuses, _, latency_sum, buckets) in snapshot:
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'spotify_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            total = sum(statuses.values())
+            lines.append(f'spotify_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f'spotify_api_request_duration_seconds_sum{{{labels}}} {latency_sum:.6f}')
+            lines.append(f'spotify_api_request_duration_seconds_count{{{labels}}} {total}')
+        caches = sorted(self.cache_stats().items())
+        for metric, field in (("spotify_cache_hits_total", "hits"), ("spotify_cache_misses_total", "misses")):
+            lines += [f"# HELP {metric} Cache {field}.", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{cache="{name}"}} {stats[field]}' for name, stats in caches]
+        for metric, field, description in (("spotify_cache_bytes", "bytes", "Memory held by the cache, in bytes."),
+                                           ("spotify_cache_evictions_total", "evictions", "Entries evicted.")):
+            lines += [f"# HELP {metric} {description}",
+                      f"# TYPE {metric} {'counter' if metric.endswith('_total') else 'gauge'}"]
+            lines += [f'{metric}{{cache="{name}"}} {stats[field]}' for name, stats in caches if field in stats]
+        startup = startup_stats.snapshot()
+        if startup["cold_start"] is not None:
+            lines += ["# HELP spotify_app_cold_start_seconds Time from process start to the first script run.",
+                      "# TYPE spotify_app_cold_start_seconds gauge",
+                      f"spotify_app_cold_start_seconds {startup['cold_start']:.6f}"]
+        lines += ["# HELP spotify_lazy_import_seconds Time taken by each lazily imported module.",
+                  "# TYPE spotify_lazy_import_seconds gauge"]
+        lines += [f'spotify_lazy_import_seconds{{module="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(startup["lazy_imports"].items())]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+
+metrics = Metrics()
+_current_rerun = contextvars.ContextVar("spotify_rerun_stats", default=None)
+
+
+def start_rerun():
+    """Starts counting the requests made by this script run (and the workers it starts)."""
+    startup_stats.record_first_rerun()
+    rerun = RerunStats()
+    _current_rerun.set(rerun)
+    return rerun
+
+
+def current_rerun():
+    return _current_rerun.get()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = metrics.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port):
+    """Serves the Prometheus dump on the given port from a daemon thread (once per process)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("", int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
@@ -0,0 +1,70 @@
+"""
+Vectorized mood classification.
+
+A library's audio features are held in one DataFrame (one row per track, one
+float column per feature), and every mood is a set of `<feature>_range` bounds.
+All moods are checked against the whole matrix in a single NumPy broadcast, so the
+cost of classifying a library doesn't grow with the number of moods.
+"""
+from spotify_client.features_cache import FEATURE_NAMES
+from spotify_client.startup import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+MOOD_OPTIONS = {
+    "Happy": {"valence_range": (0.5, 1.0), "energy_range": (0.4, 1.0)},
+    "Relaxed": {"valence_range": (0.3, 0.7), "energy_range": (0.0, 0.6)},
+    "Energetic": {"valence_range": (0.4, 1.0), "energy_range": (0.7, 1.0)},
+    "Sad": {"valence_range": (0.0, 0.4), "energy_range": (0.0, 0.5)}
+}
+
+# Slider bounds for user-defined moods.
+FEATURE_RANGES = {
+    "danceability": (0.0, 1.0),
+    "energy": (0.0, 1.0),
+    "valence": (0.0, 1.0),
+    "acousticness": (0.0, 1.0),
+    "instrumentalness": (0.0, 1.0),
+    "liveness": (0.0, 1.0),
+    "speechiness": (0.0, 1.0),
+    "tempo": (0.0, 250.0),
+    "loudness": (-60.0, 0.0),
+}
+
+
+def build_feature_frame(track_ids, features_by_id):
+    """
+    Returns a float DataFrame indexed by track ID with one column per audio feature.
+    Tracks without features are dropped; the order of track_ids is kept.
+    """
+    rows = [features_by_id[track_id] for track_id in track_ids if features_by_id.get(track_id)]
+    frame = pd.DataFrame.from_records(rows, columns=["id"] + FEATURE_NAMES)
+    return frame.set_index("id").astype(float)
+
+
+def classify_moods(frame, mood_options=MOOD_OPTIONS):
+    """
+    Returns a boolean DataFrame (tracks x moods) telling which tracks match each mood.
+    A mood's criteria are `<feature>_range` tuples; features it doesn't mention are unconstrained.
+    """
+    moods = list(mood_options)
+    columns = list(frame.columns)
+    lower = np.full((len(moods), len(columns)), -np.inf)
+    upper = np.full((len(moods), len(columns)), np.inf)
+    constrained = np.zeros((len(moods), len(columns)), dtype=bool)
+    for i, mood in enumerate(moods):
+        for key, (low, high) in mood_options[mood].items():
+            j = columns.index(key[:-len("_range")])
+            lower[i, j], upper[i, j], constrained[i, j] = low, high, True
+
+    values = frame.to_numpy(dtype=float)[:, None, :]
+    in_range = (values >= lower) & (values <= upper)
+    matches = (in_range | ~constrained).all(axis=2)
+    return pd.DataFrame(matches, index=frame.index, columns=moods)
+
+
+def mood_track_ids(matches, mood, limit=None):
+    """Track IDs matching `mood`, in library order, at most `limit` of them."""
+    track_ids = matches.index[matches[mood].to_numpy()]
+    return list(track_ids[:limit] if limit is not None else track_ids)
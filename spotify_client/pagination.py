@@ -0,0 +1,107 @@
+"""
+Offset-based pagination for Spotify paging objects.
+
+The first page is fetched on its own to learn `total`; every remaining offset is
+then known up front, so those pages are fetched concurrently on a bounded thread
+pool. Pages are still yielded in their original order, each one as soon as it and
+all pages before it have arrived. Only `max_workers` pages are in flight at a time,
+so a consumer that stops iterating early also stops further requests.
+"""
+from collections import deque
+
+from spotify_client import http_client
+from spotify_client.concurrency import ContextThreadPoolExecutor
+from spotify_client.http_cache import http_cache
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.records import track_record
+
+API_URL = "https://api.spotify.com/v1"
+MAX_WORKERS = 8
+
+
+def fetch_page(url, access_token, offset, limit, params=None, project=None):
+    """
+    Fetches one page. project, if given, maps every item (dropping None results) as soon as the page is parsed,
+    so the raw item JSON doesn't outlive this call.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    page_params = dict(params or {}, offset=offset, limit=limit)
+    if project is not None and http_cache.projects(url):
+        response, page = http_client.get_page(url, project, headers=headers, params=page_params)
+        if page is None:
+            raise SpotifyAPIError(response)
+        return page
+    response = http_client.get(url, headers=headers, params=page_params)
+    if not response.ok:
+        raise SpotifyAPIError(response)
+    page = response.json()
+    if project is not None:
+        page['items'] = [record for record in map(project, page.get('items') or []) if record is not None]
+    return page
+
+
+def iter_pages(url, access_token, limit=50, params=None, max_workers=MAX_WORKERS, max_items=None, on_total=None,
+               project=None):
+    """
+    Yields the `items` list of every page of a paged endpoint, in order.
+    on_total, if given, is called with the endpoint's `total` once the first page is in.
+    project, if given, is applied to every item in the worker thread that fetched it (see fetch_page).
+    Raises SpotifyAPIError if a page can't be fetched.
+    """
+    first_page = fetch_page(url, access_token, 0, limit, params, project)
+    total = first_page.get('total') or 0
+    if max_items is not None:
+        total = min(total, max_items)
+    if on_total is not None:
+        on_total(total)
+    yield first_page.get('items', [])
+
+    offsets = iter(range(limit, total, limit))
+
+    with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+
+        def submit_next():
+            offset = next(offsets, None)
+            if offset is not None:
+                in_flight.append(executor.submit(fetch_page, url, access_token, offset, limit, params, project))
+
+        for _ in range(max_workers):
+            submit_next()
+        try:
+            while in_flight:
+                page = in_flight.popleft().result()
+                submit_next()
+                yield page.get('items', [])
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def get_all_items(url, access_token, limit=50, params=None, max_workers=MAX_WORKERS, max_items=None):
+    items = []
+    for page in iter_pages(url, access_token, limit, params, max_workers, max_items):
+        items.extend(page)
+    return items
+
+
+def iter_saved_tracks(access_token, **kwargs):
+    return iter_pages(f"{API_URL}/me/tracks", access_token, limit=50, **kwargs)
+
+
+def iter_playlists(access_token, **kwargs):
+    return iter_pages(f"{API_URL}/me/playlists", access_token, limit=50, **kwargs)
+
+
+def iter_playlist_items(playlist_id, access_token, **kwargs):
+    return iter_pages(f"{API_URL}/playlists/{playlist_id}/tracks", access_token, limit=100, **kwargs)
+
+
+def iter_saved_track_records(access_token, **kwargs):
+    """Like iter_saved_tracks, but yields pages of compact TrackRecords."""
+    return iter_saved_tracks(access_token, project=track_record, **kwargs)
+
+
+def iter_playlist_track_records(playlist_id, access_token, **kwargs):
+    """Like iter_playlist_items, but yields pages of compact TrackRecords."""
+    return iter_playlist_items(playlist_id, access_token, project=track_record, **kwargs)
@@ -0,0 +1,56 @@
+"""
+Per-session index of the current user's playlists.
+
+The full /me/playlists listing is loaded once (all pages) and kept in the session,
+keyed by playlist ID. It is dropped whenever the app creates a playlist, and
+reloaded at most every REVALIDATE_SECONDS. Every page goes out with its ETag then,
+so a listing in which no playlist was added, removed or changed (on any page)
+costs only bodiless 304s.
+"""
+import time
+
+from spotify_client.pagination import API_URL, get_all_items
+
+PLAYLISTS_URL = f"{API_URL}/me/playlists"
+PAGE_SIZE = 50
+REVALIDATE_SECONDS = 60
+
+SESSION_KEY = 'playlist_index'
+
+
+class PlaylistIndex:
+    def __init__(self, playlists):
+        self.by_id = {playlist['id']: playlist for playlist in playlists}
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, playlist_id):
+        return playlist_id in self.by_id
+
+    def name(self, playlist_id):
+        return self.by_id[playlist_id]['name']
+
+    def update_snapshot(self, playlist_id, snapshot_id):
+        """Records the snapshot_id of a write we made, so the index stays current until it is reloaded. None is ignored."""
+        if playlist_id in self.by_id and snapshot_id is not None:
+            self.by_id[playlist_id] = dict(self.by_id[playlist_id], snapshot_id=snapshot_id)
+
+
+def load_playlist_index(access_token):
+    """Loads every page of the user's playlists. Raises SpotifyAPIError if a page can't be fetched."""
+    playlists = get_all_items(PLAYLISTS_URL, access_token, limit=PAGE_SIZE)
+    return PlaylistIndex(playlists)
+
+
+def get_playlist_index(session_state, access_token):
+    """Returns the session's playlist index, loading it when it is missing or older than REVALIDATE_SECONDS."""
+    index = session_state.get(SESSION_KEY)
+    if index is None or time.time() - index.loaded_at >= REVALIDATE_SECONDS:
+        index = session_state[SESSION_KEY] = load_playlist_index(access_token)
+    return index
+
+
+def invalidate_playlist_index(session_state):
+    session_state.pop(SESSION_KEY, None)
@@ -0,0 +1,42 @@
+"""Data shown on the Profile page: the user's profile, top items and recently played tracks."""
+import time
+
+from spotify_client import http_client
+from spotify_client.api import get_spotify_user_profile
+from spotify_client.concurrency import ContextThreadPoolExecutor
+from spotify_client.pagination import API_URL
+
+TIME_RANGES = ["short_term", "medium_term", "long_term"]
+ITEM_TYPES = ["tracks", "artists"]
+
+SESSION_KEY = 'profile_data'
+
+
+def get_user_top_items(access_token, item_type='tracks', time_range='medium_term'):
+    url = f"{API_URL}/me/top/{item_type}"
+    headers = {'Authorization': f'Bearer {access_token}'}
+    params = {"time_range": time_range, "limit": 10}
+    response = http_client.get(url, headers=headers, params=params)
+    return response.json().get('items', [])
+
+
+def get_user_engagement(access_token):
+    url = f"{API_URL}/me/player/recently-played"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = http_client.get(url, headers=headers)
+    return response.json().get('items', [])
+
+
+def fetch_profile_data(access_token, max_workers=len(TIME_RANGES) * len(ITEM_TYPES) + 2):
+    """Fetches the profile, every top-items combination and recently played tracks, concurrently."""
+    with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        profile = executor.submit(get_spotify_user_profile, access_token)
+        recent = executor.submit(get_user_engagement, access_token)
+        top_items = {(item_type, time_range): executor.submit(get_user_top_items, access_token, item_type, time_range)
+                     for item_type in ITEM_TYPES for time_range in TIME_RANGES}
+        return {
+            "fetched_at": time.time(),
+            "profile": profile.result(),
+            "recently_played": recent.result(),
+            "top_items": {key: future.result() for key, future in top_items.items()},
+        }
@@ -0,0 +1,34 @@
+"""
+Compact track records.
+
+Raw /me/tracks and playlist items carry full album objects, image lists and two
+~180-entry available_markets lists per track, while the app only ever reads a
+handful of fields. The paginator projects every item into a TrackRecord as soon
+as its page is parsed, so the raw JSON is dropped right away instead of being
+pinned for as long as a session holds its tracks.
+"""
+
+
+class TrackRecord:
+    __slots__ = ("id", "uri", "name", "artist", "added_at", "is_local")
+
+    def __init__(self, id, uri, name, artist, added_at, is_local=False):
+        self.id = id
+        self.uri = uri
+        self.name = name
+        self.artist = artist
+        self.added_at = added_at
+        self.is_local = is_local
+
+    def __repr__(self):
+        return f"TrackRecord({self.id!r}, {self.name!r}, {self.artist!r})"
+
+
+def track_record(item):
+    """Projects a saved-track or playlist item to a TrackRecord; None if it has no track (e.g. a removed one)."""
+    track = item.get('track')
+    if not track or not (track.get('id') or track.get('uri')):
+        return None
+    artists = track.get('artists') or [{}]
+    return TrackRecord(track.get('id'), track.get('uri'), track.get('name', ''), artists[0].get('name', ''),
+                       item.get('added_at', ''), bool(track.get('is_local')))
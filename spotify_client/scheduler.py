@@ -0,0 +1,183 @@
+"""
+Process-wide scheduler for Spotify API traffic.
+
+Every request made through http_client asks the scheduler for a slot first. A slot
+is granted when:
+- no request waits in a higher-priority lane (interactive lookups go ahead of
+  background library scans),
+- the request's endpoint is under its concurrency limit,
+- total in-flight requests are under the adaptive concurrency limit,
+- the global token bucket has a token,
+- and no 429 Retry-After pause is in effect.
+
+The concurrency limit follows AIMD: it grows by about one slot per window of
+successful responses and halves (at most once per second) when Spotify answers 429.
+"""
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from spotify_client.rate_limit import TokenBucket
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RATE = float(os.environ.get("SPOTIFY_SCHEDULER_RATE", "20"))
+BURST = float(os.environ.get("SPOTIFY_SCHEDULER_BURST", "40"))
+MAX_CONCURRENCY = int(os.environ.get("SPOTIFY_SCHEDULER_MAX_CONCURRENCY", "16"))
+MIN_CONCURRENCY = 1
+DEFAULT_ENDPOINT_LIMIT = 8
+ENDPOINT_LIMITS = {
+    "/v1/me/tracks": 4,
+    "/v1/audio-features": 4,
+    "/v1/search": 4,
+    "/v1/playlists/{id}/tracks": 4,
+}
+DECREASE_INTERVAL = 1.0
+
+_ID_SEGMENT = re.compile(r"^[0-9A-Za-z]{22}$")
+
+_priority = contextvars.ContextVar("spotify_request_priority", default=INTERACTIVE)
+
+
+def endpoint_key(url):
+    """Collapses IDs out of a URL path so requests to the same endpoint share limits, e.g. /v1/playlists/{id}/tracks."""
+    segments = urlparse(url).path.rstrip("/").split("/")
+    for i, segment in enumerate(segments):
+        if _ID_SEGMENT.match(segment) or (i and segments[i - 1] == "users"):
+            segments[i] = "{id}"
+    return "/".join(segments) or "/"
+
+
+@contextmanager
+def background():
+    """Runs the enclosed requests (and pagination workers started inside) in the background lane."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class Scheduler:
+    def __init__(self, rate=RATE, burst=BURST, max_concurrency=MAX_CONCURRENCY, min_concurrency=MIN_CONCURRENCY,
+                 endpoint_limits=None, default_endpoint_limit=DEFAULT_ENDPOINT_LIMIT):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.endpoint_limits = dict(ENDPOINT_LIMITS if endpoint_limits is None else endpoint_limits)
+        self.default_endpoint_limit = default_endpoint_limit
+        self.throttled = 0
+        self._lanes = (deque(), deque())
+        self._in_flight = 0
+        self._endpoint_in_flight = Counter()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _endpoint_limit(self, endpoint):
+        return self.endpoint_limits.get(endpoint, self.default_endpoint_limit)
+
+    def _first_startable(self, lane):
+        """Returns the first waiting ticket in the lane whose endpoint has room, if any."""
+        for ticket in self._lanes[lane]:
+            if self._endpoint_in_flight[ticket[1]] < self._endpoint_limit(ticket[1]):
+                return ticket
+        return None
+
+    def _next_startable(self, priority):
+        if any(self._first_startable(lane) for lane in range(priority)):
+            return None
+        return self._first_startable(priority)
+
+    def acquire(self, url, priority=None):
+        """Blocks until the request may be sent and returns its endpoint; pass that to release() afterwards."""
+        endpoint = endpoint_key(url)
+        priority = current_priority() if priority is None else priority
+        ticket = (object(), endpoint)
+        with self._cond:
+            self._lanes[priority].append(ticket)
+            try:
+                while True:
+                    wait = self._paused_until - time.monotonic()
+                    if wait <= 0:
+                        wait = None
+                        if (self._in_flight < int(self.concurrency_limit)
+                                and self._next_startable(priority) is ticket):
+                            wait = self.bucket.try_acquire()
+                            if not wait:
+                                break
+                    self._cond.wait(wait)
+            finally:
+                self._lanes[priority].remove(ticket)
+            self._in_flight += 1
+            self._endpoint_in_flight[endpoint] += 1
+            # Others in this lane may now be first in line for a different endpoint
+            self._cond.notify_all()
+        return endpoint
+
+    def release(self, endpoint, status_code=None, retry_after=None):
+        """Frees the slot and adapts the concurrency limit to the response status."""
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            self._endpoint_in_flight[endpoint] -= 1
+            if status_code == 429:
+                self.throttled += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                if now - self._last_decrease >= DECREASE_INTERVAL:
+                    self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                    self._last_decrease = now
+            elif status_code is not None and status_code < 500:
+                self.concurrency_limit = min(self.max_concurrency,
+                                             self.concurrency_limit + 1 / self.concurrency_limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url, priority=None):
+        """Holds a slot for the enclosed request. Call the yielded function with the response to report it."""
+        endpoint = self.acquire(url, priority)
+        outcome = {}
+
+        def report(status_code, retry_after=None):
+            outcome.update(status_code=status_code, retry_after=retry_after)
+
+        try:
+            yield report
+        finally:
+            self.release(endpoint, **outcome)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency_limit": int(self.concurrency_limit),
+                "in_flight": self._in_flight,
+                "waiting_interactive": len(self._lanes[INTERACTIVE]),
+                "waiting_background": len(self._lanes[BACKGROUND]),
+                "throttled": self.throttled,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replaces the process-wide scheduler, e.g. with different limits when testing against a fake server."""
+    global _scheduler
+    _scheduler = scheduler
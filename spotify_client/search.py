@@ -0,0 +1,164 @@
+"""
+Track search for get_track_id.
+
+Lookups are resolved in three steps: a token-based inverted index over the user's
+own library and playlists (no network at all), then the "search" namespace of the
+shared cache, holding earlier /v1/search results keyed on the normalized (track,
+artist) query, and only then the API. Identical searches that are already in flight anywhere in the
+process are shared through spotify_client.single_flight, so concurrent callers
+wait on a single request.
+"""
+import re
+import threading
+import unicodedata
+
+from spotify_client import http_client
+from spotify_client.api import get_spotify_user_profile
+from spotify_client.library import LibrarySnapshot, snapshot_version
+from spotify_client.shared_cache import MISSING, shared_cache
+from spotify_client.single_flight import request_key, single_flight
+
+SEARCH_URL = "https://api.spotify.com/v1/search"
+SEARCH_NAMESPACE = "search"
+
+SESSION_KEY = 'track_search_index'
+
+
+def normalize(text):
+    """Lower-cases, strips accents and punctuation and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return " ".join(re.findall(r"\w+", text))
+
+
+def normalize_query(track_name, artist):
+    return normalize(track_name), normalize(artist)
+
+
+class TrackSearchIndex:
+    """Inverted index from name/artist tokens to track IDs."""
+
+    def __init__(self):
+        # Whose library snapshot is indexed, and which saved version of it was added last
+        self.user_id = None
+        self.snapshot_version = None
+        self._postings = {}
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def add(self, track_id, name, artist):
+        name, artist = normalize_query(name, artist)
+        with self._lock:
+            if track_id in self._tracks:
+                return
+            self._tracks[track_id] = (name, artist)
+            for token in set(name.split()):
+                self._postings.setdefault(token, []).append(track_id)
+
+    def add_tracks(self, tracks):
+        """Adds Spotify track objects (as found in /me/tracks or playlist items)."""
+        for track in tracks:
+            if track and track.get('id'):
+                artists = track.get('artists') or [{}]
+                self.add(track['id'], track.get('name', ''), artists[0].get('name', ''))
+
+    def add_records(self, records):
+        """Adds TrackRecords (see spotify_client.records)."""
+        for record in records:
+            if record.id:
+                self.add(record.id, record.name, record.artist)
+
+    def add_snapshot(self, snapshot):
+        for track_id, name, artist in zip(snapshot.track_ids.tolist(), snapshot.names.tolist(),
+                                          snapshot.artists.tolist()):
+            self.add(track_id, name, artist)
+
+    def lookup(self, track_name, artist=""):
+        """Returns the ID of a known track with exactly this name (and artist, if given), else None."""
+        name, artist = normalize_query(track_name, artist)
+        tokens = name.split()
+        if not tokens:
+            return None
+        with self._lock:
+            postings = [self._postings.get(token, ()) for token in tokens]
+            candidates = min(postings, key=len)
+            for track_id in candidates:
+                track_name_norm, track_artist = self._tracks[track_id]
+                if track_name_norm == name and (not artist or artist in track_artist):
+                    return track_id
+        return None
+
+
+def _search_remote(track_name, artist, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {
+        "q": f"track: {track_name} artist: {artist}",
+        "type": "track",
+        "limit": 1
+    }
+    response = http_client.get(SEARCH_URL, headers=headers, params=params)
+    if not response.ok:
+        return MISSING
+    results = response.json().get('tracks', {}).get('items', [])
+    return results[0]['id'] if results else None
+
+
+def search_track_id(track_name, artist, access_token, local_index=None, limiter=None):
+    """
+    Resolves a (track, artist) pair to a Spotify track ID, or None if there is no match.
+    limiter, if given, is a TokenBucket acquired before a request actually goes out.
+    """
+    if local_index is not None:
+        track_id = local_index.lookup(track_name, artist)
+        if track_id:
+            return track_id
+
+    key = normalize_query(track_name, artist)
+    cached = shared_cache.get(SEARCH_NAMESPACE, key)
+    if cached is not MISSING:
+        return cached
+
+    def search():
+        if limiter is not None:
+            limiter.acquire()
+        result = _search_remote(track_name, artist, access_token)
+        if result is not MISSING:
+            shared_cache.set(SEARCH_NAMESPACE, key, result)
+        return result
+
+    track, artist_name = key
+    result = single_flight.do(request_key(SEARCH_URL, {"track": track, "artist": artist_name}), search)
+    return None if result is MISSING else result
+
+
+def get_local_search_index(session_state):
+    """
+    Returns the session's search index over the user's own library. Whenever the local snapshot has been
+    saved again since the last call (by any page or the warm-up), its tracks are added.
+    """
+    index = session_state.get(SESSION_KEY)
+    if index is None:
+        index = session_state[SESSION_KEY] = TrackSearchIndex()
+    if index.user_id is None:
+        user_profile = get_spotify_user_profile(session_state['access_token'])
+        if user_profile is None:
+            return index
+        index.user_id = user_profile['id']
+    version = snapshot_version(index.user_id)
+    if version is not None and version != index.snapshot_version:
+        snapshot = LibrarySnapshot.load(index.user_id)
+        if snapshot is not None:
+            index.add_snapshot(snapshot)
+        index.snapshot_version = version
+    return index
+
+
+def get_track_id(track_name, artist, access_token, session_state):
+    return search_track_id(track_name, artist, access_token, get_local_search_index(session_state))
+
+
+def search_cache_stats():
+    return shared_cache.stats(SEARCH_NAMESPACE)
@@ -0,0 +1,283 @@
+"""
+Process-wide cache shared by every session, with a memory budget.
+
+Entries live in namespaces (features, search, profile, playlists, top_items, ...),
+each with its own TTL. Every entry's size is measured as its pickled length, and
+once the total goes over the byte budget the least recently used entries are
+evicted, whatever their namespace, until it fits again.
+
+An optional backend (SPOTIFY_CACHE_BACKEND) sits behind the in-memory tier, so
+several Streamlit replicas can share warmed data:
+
+    sqlite:///path/to/cache.sqlite3   local SQLite database in WAL mode
+    redis://host:6379/0               any Redis-compatible server (needs the `redis` package)
+
+Backend values are pickles, so only point replicas at a store they trust. Cached
+values are shared between sessions and must not be mutated by callers.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from spotify_client.metrics import metrics
+
+MISSING = object()
+
+BUDGET_BYTES = int(float(os.environ.get("SPOTIFY_CACHE_BUDGET_MB", "256")) * 2 ** 20)
+BACKEND_URL = os.environ.get("SPOTIFY_CACHE_BACKEND", "")
+
+DEFAULT_TTL = 3600
+NAMESPACE_TTLS = {
+    "features": 30 * 86400,
+    "search": 6 * 3600,
+    "profile": 86400,
+    "playlists": 86400,
+    "top_items": 86400,
+}
+
+# Rough per-entry bookkeeping overhead on top of the pickled value
+_ENTRY_OVERHEAD = 200
+
+
+def _key_string(key):
+    return key if isinstance(key, str) else repr(key)
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def get_many(self, namespace, keys):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE namespace = ? AND expires_at > ? "
+                    f"AND key IN ({','.join('?' * len(batch))})",
+                    [namespace, time.time(), *batch],
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def set_many(self, namespace, items, ttl):
+        expires_at = time.time() + ttl
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                                   [(namespace, key, value, expires_at) for key, value in items])
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, namespace, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="spotify:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("A redis:// cache backend needs the redis package: pip install redis") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _name(self, namespace, key):
+        return f"{self.prefix}{namespace}:{key}"
+
+    def get_many(self, namespace, keys):
+        values = self._client.mget([self._name(namespace, key) for key in keys]) if keys else []
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, namespace, items, ttl):
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in items:
+            pipeline.set(self._name(namespace, key), value, ex=max(1, int(ttl)))
+        pipeline.execute()
+
+    def delete(self, namespace, key):
+        self._client.delete(self._name(namespace, key))
+
+
+def backend_from_url(url):
+    """Backend for a SPOTIFY_CACHE_BACKEND value; None for an empty one."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported cache backend: {url}")
+
+
+class NamespaceStats:
+    def __init__(self):
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = 0
+        self.bytes = 0
+
+
+class SharedCache:
+    def __init__(self, budget_bytes=BUDGET_BYTES, ttls=None, backend=None):
+        self.budget_bytes = budget_bytes
+        self.ttls = dict(NAMESPACE_TTLS if ttls is None else ttls)
+        self.backend = backend
+        self.bytes = 0
+        self.backend_errors = 0
+        self._entries = OrderedDict()
+        self._namespaces = defaultdict(NamespaceStats)
+        self._lock = threading.Lock()
+
+    def ttl(self, namespace):
+        return self.ttls.get(namespace, DEFAULT_TTL)
+
+    def get(self, namespace, key, default=MISSING):
+        return self.get_many(namespace, [key]).get(key, default)
+
+    def get_many(self, namespace, keys):
+        """Returns {key: value} for the keys that are cached in memory or in the backend."""
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            stats = self._namespaces[namespace]
+            for key in keys:
+                entry = self._entries.get((namespace, key))
+                if entry is not None and entry[2] <= now:
+                    self._remove((namespace, key))
+                    entry = None
+                if entry is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end((namespace, key))
+                    found[key] = entry[0]
+            stats.hits += len(found)
+
+        if missing and self.backend is not None:
+            names = {_key_string(key): key for key in missing}
+            try:
+                stored = self.backend.get_many(namespace, list(names))
+            except Exception:
+                stored = {}
+                self._backend_error()
+            loaded = {}
+            for name, value in stored.items():
+                try:
+                    loaded[names[name]] = pickle.loads(value)
+                except Exception:
+                    # A corrupt entry, or one pickled by another version of the app: a miss, and gone
+                    self._backend_error()
+                    self._backend_delete(namespace, name)
+            with self._lock:
+                self._namespaces[namespace].backend_hits += len(loaded)
+                for key, value in loaded.items():
+                    self._store(namespace, key, value, len(stored[_key_string(key)]))
+            found.update(loaded)
+        with self._lock:
+            self._namespaces[namespace].misses += len(keys) - len(found)
+        return found
+
+    def set(self, namespace, key, value):
+        self.set_many(namespace, [(key, value)])
+
+    def set_many(self, namespace, items):
+        pickled = [(key, value, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for key, value in items]
+        with self._lock:
+            for key, value, data in pickled:
+                self._store(namespace, key, value, len(data))
+        if self.backend is not None and pickled:
+            try:
+                self.backend.set_many(namespace, [(_key_string(key), data) for key, _, data in pickled],
+                                      self.ttl(namespace))
+            except Exception:
+                self._backend_error()
+
+    def pop(self, namespace, key):
+        with self._lock:
+            self._remove((namespace, key))
+        if self.backend is not None:
+            self._backend_delete(namespace, _key_string(key))
+
+    def _backend_delete(self, namespace, name):
+        try:
+            self.backend.delete(namespace, name)
+        except Exception:
+            self._backend_error()
+
+    def _backend_error(self):
+        with self._lock:
+            self.backend_errors += 1
+
+    def clear(self):
+        """Empties the in-memory tier (the backend keeps its entries until they expire)."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            for stats in self._namespaces.values():
+                stats.entries = stats.bytes = 0
+
+    def _store(self, namespace, key, value, size):
+        size += _ENTRY_OVERHEAD
+        self._remove((namespace, key))
+        if size > self.budget_bytes:
+            return
+        self._entries[(namespace, key)] = (value, size, time.monotonic() + self.ttl(namespace))
+        stats = self._namespaces[namespace]
+        stats.entries += 1
+        stats.bytes += size
+        self.bytes += size
+        while self.bytes > self.budget_bytes:
+            evicted = next(iter(self._entries))
+            self._remove(evicted)
+            self._namespaces[evicted[0]].evictions += 1
+
+    def _remove(self, full_key):
+        entry = self._entries.pop(full_key, None)
+        if entry is not None:
+            stats = self._namespaces[full_key[0]]
+            stats.entries -= 1
+            stats.bytes -= entry[1]
+            self.bytes -= entry[1]
+
+    def stats(self, namespace=None):
+        """Hit ratio and memory use of one namespace, or of the whole cache when namespace is None."""
+        with self._lock:
+            namespaces = [self._namespaces[namespace]] if namespace else list(self._namespaces.values())
+            hits = sum(stats.hits + stats.backend_hits for stats in namespaces)
+            misses = sum(stats.misses for stats in namespaces)
+            result = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "backend_hits": sum(stats.backend_hits for stats in namespaces),
+                "evictions": sum(stats.evictions for stats in namespaces),
+                "entries": sum(stats.entries for stats in namespaces),
+                "bytes": sum(stats.bytes for stats in namespaces),
+            }
+            if namespace is None:
+                result.update(budget_bytes=self.budget_bytes, backend_errors=self.backend_errors)
+            return result
+
+    def register_metrics(self, *namespaces):
+        metrics.register_cache("shared", self.stats)
+        for namespace in namespaces:
+            metrics.register_cache(f"shared/{namespace}", lambda namespace=namespace: self.stats(namespace))
+
+
+shared_cache = SharedCache(backend=backend_from_url(BACKEND_URL))
+shared_cache.register_metrics(*NAMESPACE_TTLS)
@@ -0,0 +1,111 @@
+"""
+Local nearest-neighbour search over audio-feature vectors.
+
+Every feature is scaled to [0, 1] using fixed bounds (not the library's own min/max),
+so vectors never need re-normalizing when tracks are appended and the index can
+grow incrementally. Queries are a weighted Euclidean distance from the centroid of
+the seed vectors, computed over the whole matrix at once with NumPy.
+"""
+import threading
+
+from spotify_client.features_cache import FEATURE_NAMES
+from spotify_client.moods import FEATURE_RANGES
+from spotify_client.startup import lazy_import
+
+np = lazy_import("numpy")
+
+SIMILARITY_FEATURES = list(FEATURE_RANGES)
+
+_LOWER = [FEATURE_RANGES[name][0] for name in SIMILARITY_FEATURES]
+_SPAN = [FEATURE_RANGES[name][1] - FEATURE_RANGES[name][0] for name in SIMILARITY_FEATURES]
+_COLUMNS = [FEATURE_NAMES.index(name) for name in SIMILARITY_FEATURES]
+
+
+def normalize(matrix):
+    """Scales an (n x len(SIMILARITY_FEATURES)) matrix to [0, 1] per feature."""
+    lower = np.array(_LOWER, dtype=np.float32)
+    span = np.array(_SPAN, dtype=np.float32)
+    return np.clip((np.asarray(matrix, dtype=np.float32) - lower) / span, 0.0, 1.0)
+
+
+def feature_vector(features):
+    return [np.nan if features.get(name) is None else features[name] for name in SIMILARITY_FEATURES]
+
+
+class SimilarityIndex:
+    def __init__(self, capacity=1024):
+        self._vectors = np.empty((capacity, len(SIMILARITY_FEATURES)), dtype=np.float32)
+        self._track_ids = []
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._track_ids)
+
+    def __contains__(self, track_id):
+        return track_id in self._positions
+
+    def _append(self, track_ids, matrix):
+        rows = np.isfinite(matrix).all(axis=1)
+        track_ids = [track_id for track_id, keep in zip(track_ids, rows) if keep]
+        matrix = normalize(matrix[rows])
+        with self._lock:
+            fresh = [i for i, track_id in enumerate(track_ids) if track_id not in self._positions]
+            if not fresh:
+                return 0
+            size = len(self._track_ids)
+            needed = size + len(fresh)
+            if needed > len(self._vectors):
+                grown = np.empty((max(needed, 2 * len(self._vectors)), self._vectors.shape[1]), dtype=np.float32)
+                grown[:size] = self._vectors[:size]
+                self._vectors = grown
+            self._vectors[size:needed] = matrix[fresh]
+            for offset, i in enumerate(fresh):
+                self._positions[track_ids[i]] = size + offset
+                self._track_ids.append(track_ids[i])
+            return len(fresh)
+
+    def add_features(self, features_by_id):
+        """Adds audio-features dicts (track ID -> features); IDs already indexed are skipped."""
+        track_ids = [track_id for track_id in features_by_id if track_id not in self._positions]
+        if not track_ids:
+            return 0
+        matrix = np.array([feature_vector(features_by_id[track_id]) for track_id in track_ids], dtype=np.float32)
+        return self._append(track_ids, matrix)
+
+    def add_snapshot(self, snapshot):
+        """Adds the tracks of a LibrarySnapshot that aren't indexed yet."""
+        track_ids = snapshot.track_ids.tolist()
+        fresh = [i for i, track_id in enumerate(track_ids) if track_id not in self._positions]
+        if not fresh:
+            return 0
+        matrix = np.asarray(snapshot.features)[fresh][:, _COLUMNS]
+        return self._append([track_ids[i] for i in fresh], matrix)
+
+    def query(self, seed_features, k=10, weights=None, exclude_ids=()):
+        """
+        Returns up to k (track_id, distance) pairs closest to the centroid of the seed feature dicts.
+        weights maps feature name -> weight (missing features weigh 1.0).
+        """
+        seeds = np.array([feature_vector(features) for features in seed_features], dtype=np.float32)
+        seeds = seeds[np.isfinite(seeds).all(axis=1)]
+        if not len(seeds):
+            return []
+        centroid = normalize(seeds).mean(axis=0)
+        w = np.array([(weights or {}).get(name, 1.0) for name in SIMILARITY_FEATURES], dtype=np.float32)
+
+        with self._lock:
+            size = len(self._track_ids)
+            distances = np.sqrt((((self._vectors[:size] - centroid) ** 2) * w).sum(axis=1))
+            track_ids = list(self._track_ids)
+        for track_id in exclude_ids:
+            position = self._positions.get(track_id)
+            if position is not None and position < size:
+                distances[position] = np.inf
+
+        k = min(k, int(np.isfinite(distances).sum()))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(track_ids[i], float(distances[i])) for i in nearest]
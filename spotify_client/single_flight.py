@@ -0,0 +1,78 @@
+"""
+Process-wide request coalescing.
+
+When several sessions ask for the same thing at the same moment (a popular
+track's audio features, the same search, the app's client-credentials token),
+only the first caller sends the request. Everyone else arriving while it is in
+flight waits on the leader's Future and gets the same result or exception.
+Nothing is kept after the call completes; caching is up to the caller.
+
+Only use it for requests whose response doesn't depend on who is asking.
+"""
+import threading
+from concurrent.futures import Future
+
+from spotify_client.metrics import metrics
+
+
+def request_key(url, params=None):
+    """(endpoint, normalized params) key; parameter order and surrounding whitespace don't matter."""
+    return url, tuple(sorted((name, str(value).strip()) for name, value in (params or {}).items()))
+
+
+class SingleFlight:
+    def __init__(self):
+        self.leaders = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """
+        Returns (future, leader). A leader must compute the result and pass it to resolve() (or fail());
+        anyone else just waits on future.result().
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def resolve(self, key, result):
+        with self._lock:
+            future = self._calls.pop(key)
+        future.set_result(result)
+
+    def fail(self, key, exception):
+        with self._lock:
+            future = self._calls.pop(key)
+        future.set_exception(exception)
+
+    def do(self, key, fn):
+        """Returns fn(), or the result of an identical call already in flight."""
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.resolve(key, result)
+        return result
+
+    def stats(self):
+        total = self.leaders + self.shared
+        return {
+            "hits": self.shared,
+            "misses": self.leaders,
+            "hit_ratio": self.shared / total if total else 0.0,
+            "in_flight": len(self._calls),
+        }
+
+
+single_flight = SingleFlight()
+metrics.register_cache("single_flight", single_flight.stats)
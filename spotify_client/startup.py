@@ -0,0 +1,146 @@
+"""
+Lazy heavy imports and startup timing.
+
+plotly takes a noticeable part of a cold start, and most reruns (the OAuth screen,
+a page that only shows text) never build a chart. Modules that need it do
+
+    px = lazy_import("plotly.express")
+
+and the real import happens on first attribute access, i.e. when a chart is
+actually built. pandas and NumPy go through lazy_import as well, but they are only
+deferred where nothing has imported them yet: many Streamlit versions import both
+themselves at startup, and lazy_import then just returns the loaded module. Every
+lazy import is timed, and the first start_rerun() records how long the process
+took to get to its first script run (cold start).
+
+    python -m spotify_client.startup Home.py "pages/Profile Management.py"
+
+imports Streamlit and then each script in a fresh interpreter (without running
+main()), and reports how long each took and which heavy modules Streamlit had
+already loaded and which the script pulled in. Run it from the repository root.
+"""
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+HEAVY_MODULES = ("numpy", "pandas", "plotly.express")
+
+
+def _process_started():
+    """time.monotonic() value at process start, from /proc on Linux; falls back to when this module was imported."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name can contain spaces, so count fields from the closing parenthesis
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.monotonic() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+
+
+class StartupStats:
+    def __init__(self):
+        self.process_started = _process_started()
+        self.cold_start = None
+        self.import_seconds = {}
+        self._lock = threading.Lock()
+
+    def record_first_rerun(self):
+        """Records the time from process start to the first script run; later calls are no-ops."""
+        with self._lock:
+            if self.cold_start is None:
+                self.cold_start = time.monotonic() - self.process_started
+
+    def record_import(self, name, seconds):
+        with self._lock:
+            self.import_seconds[name] = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {"process_age": time.monotonic() - self.process_started, "cold_start": self.cold_start,
+                    "lazy_imports": dict(self.import_seconds)}
+
+
+startup_stats = StartupStats()
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            already_loaded = self._name in sys.modules
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            if not already_loaded:
+                seconds = time.perf_counter() - started
+                startup_stats.record_import(self._name, seconds)
+                from spotify_client.metrics import current_rerun
+                rerun = current_rerun()
+                if rerun is not None:
+                    rerun.import_seconds += seconds
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """Returns the module if it is already imported, otherwise a LazyModule that imports it when first used."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+_MEASURE_SCRIPT = """
+import json, runpy, sys, time
+heavy = sys.argv[2:]
+started = time.perf_counter()
+import streamlit
+streamlit_seconds = time.perf_counter() - started
+preloaded = sorted(name for name in sys.modules if name in heavy)
+started = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="startup-check")
+print(json.dumps({"streamlit_seconds": streamlit_seconds, "seconds": time.perf_counter() - started,
+                  "preloaded": preloaded,
+                  "heavy_modules": sorted(name for name in sys.modules if name in heavy and name not in preloaded)}))
+"""
+
+
+def measure_script_import(path):
+    """
+    Imports Streamlit, then a Streamlit script, in a fresh interpreter. Returns both import times, the heavy
+    modules Streamlit had already loaded (preloaded) and the ones the script loaded on top (heavy_modules).
+    """
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", _MEASURE_SCRIPT, path, *HEAVY_MODULES],
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["interpreter_seconds"] = time.perf_counter() - started
+    return result
+
+
+def main(paths):
+    for path in paths:
+        result = measure_script_import(path)
+        preloaded = ", ".join(result["preloaded"]) or "none"
+        heavy = ", ".join(result["heavy_modules"]) or "none"
+        print(f"{path}: {result['streamlit_seconds']:.3f}s importing Streamlit, {result['seconds']:.3f}s importing "
+              f"the script, {result['interpreter_seconds']:.3f}s total; heavy modules already loaded by Streamlit: "
+              f"{preloaded}, loaded by the script: {heavy}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["Home.py"])
@@ -0,0 +1,126 @@
+"""
+Access-token management.
+
+Client-credentials tokens are cached process-wide until shortly before they
+expire, so lookups that only need an app token don't POST to accounts.spotify.com
+on every rerun, and sessions that find it expired at the same moment share one
+refresh. User tokens from the OAuth flow keep their refresh token and renew
+themselves through the refresh_token grant instead of forcing a new login.
+"""
+import threading
+import time
+
+from spotify_client import http_client
+from spotify_client.single_flight import request_key, single_flight
+
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+# Refresh this many seconds before the token actually expires.
+EXPIRY_MARGIN = 60
+
+
+class ClientCredentialsToken:
+    def __init__(self, client_id, client_secret):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._access_token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns a valid app access token, fetching a new one only when the cached one is about to expire.
+        Concurrent callers that find it expired share one token request.
+        """
+        with self._lock:
+            if self._access_token is not None and time.time() < self._expires_at - EXPIRY_MARGIN:
+                return self._access_token
+        return single_flight.do(request_key(TOKEN_URL, {"client_id": self.client_id}), self._fetch)
+
+    def _fetch(self):
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        payload = {"grant_type": "client_credentials"}
+        response = http_client.post(TOKEN_URL, headers=headers, data=payload,
+                                    auth=(self.client_id, self.client_secret))
+        data = response.json() if response.ok else {}
+        with self._lock:
+            self._access_token = data.get('access_token')
+            self._expires_at = time.time() + data.get('expires_in', 3600) if self._access_token else 0.0
+            return self._access_token
+
+
+_client_tokens = {}
+_client_tokens_lock = threading.Lock()
+
+
+def get_client_credentials_token(client_id, client_secret):
+    """Returns the shared client-credentials access token for this app."""
+    with _client_tokens_lock:
+        token = _client_tokens.get(client_id)
+        if token is None:
+            token = _client_tokens[client_id] = ClientCredentialsToken(client_id, client_secret)
+    return token.get()
+
+
+class UserToken:
+    def __init__(self, access_token, refresh_token, expires_in, client_id, client_secret):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = time.time() + expires_in
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_response(cls, data, client_id, client_secret):
+        return cls(data.get('access_token'), data.get('refresh_token'), data.get('expires_in', 3600),
+                   client_id, client_secret)
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at - EXPIRY_MARGIN
+
+    def get(self):
+        """Returns a valid user access token, refreshing it first if needed. None if the refresh failed."""
+        with self._lock:
+            if self.access_token and self.expired:
+                self.refresh()
+            return self.access_token
+
+    def refresh(self):
+        if not self.refresh_token:
+            self.access_token = None
+            return False
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": self.refresh_token,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        response = http_client.post(TOKEN_URL, data=data)
+        if not response.ok:
+            self.access_token = None
+            return False
+        payload = response.json()
+        self.access_token = payload.get('access_token')
+        # Spotify only sometimes rotates the refresh token.
+        self.refresh_token = payload.get('refresh_token', self.refresh_token)
+        self.expires_at = time.time() + payload.get('expires_in', 3600)
+        return True
+
+
+def refresh_session_token(session_state):
+    """
+    Makes sure session_state['access_token'] holds a valid user token, refreshing it if it is about to expire.
+    Drops the token from the session when it can't be refreshed so the user is asked to log in again.
+    """
+    user_token = session_state.get('user_token')
+    if user_token is None:
+        return session_state.get('access_token')
+    access_token = user_token.get()
+    if access_token:
+        session_state['access_token'] = access_token
+    else:
+        session_state.pop('user_token', None)
+        session_state.pop('access_token', None)
+    return access_token
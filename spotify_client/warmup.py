@@ -0,0 +1,145 @@
+"""
+Background cache warm-up after login.
+
+Right after the OAuth flow stores a token, start_warm_up() queues prefetches on a
+small process-wide pool: the Profile page's data, the playlist index, the saved
+tracks with their audio features (the first WARMUP_SAVED_PAGES pages, or an
+incremental sync if the user already has a local library snapshot) and a poll of
+the listening history. Everything
+runs in the scheduler's background lane, so clicks still go first.
+
+Audio features, library snapshots and listening history land in the shared on-disk caches directly.
+Session-scoped results (profile data, playlist index) are kept on the WarmUp and
+moved into st.session_state by adopt_warm_up() from the script thread, because
+worker threads can't touch the session. Cancelling a warm-up (e.g. when the user
+logs in again) drops its queued tasks and stops the saved-tracks scan at the next page.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from spotify_client import playlist_index, profile
+from spotify_client.api import get_spotify_user_profile
+from spotify_client.features import get_tracks_features
+from spotify_client.history import collect_history
+from spotify_client.http_client import SpotifyAPIError
+from spotify_client.library import PAGE_SIZE, has_snapshot, sync_library
+from spotify_client.pagination import iter_saved_track_records
+from spotify_client.scheduler import background
+
+WARMUP_WORKERS = int(os.environ.get("SPOTIFY_WARMUP_WORKERS", "2"))
+WARMUP_SAVED_PAGES = int(os.environ.get("SPOTIFY_WARMUP_SAVED_PAGES", "4"))
+
+SESSION_KEY = 'warm_up'
+
+logger = logging.getLogger(__name__)
+
+# Not a ContextThreadPoolExecutor: warm-up requests shouldn't count towards the rerun that started them
+_executor = ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix="warm-up")
+
+
+class WarmUp:
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self.results = {}
+        self.errors = {}
+        self._cancelled = threading.Event()
+        self._futures = []
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def done(self):
+        return all(future.done() for future in self._futures)
+
+    def start(self):
+        for name, task in (("profile_data", self._profile_data), ("playlist_index", self._playlist_index),
+                           ("library", self._library), ("listening_history", self._listening_history)):
+            self._futures.append(_executor.submit(self._run, name, task))
+        return self
+
+    def cancel(self):
+        """Drops queued tasks; running ones discard their results, and the saved-tracks scan stops early."""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+
+    def _run(self, name, task):
+        if self.cancelled:
+            return
+        with background():
+            try:
+                result = task()
+            except SpotifyAPIError as e:
+                self.errors[name] = e
+                return
+            except Exception as e:
+                # A warm-up is best effort, but a bug in it shouldn't vanish into an unread Future
+                logger.exception("Warm-up task %s failed", name)
+                self.errors[name] = e
+                return
+        if result is not None and not self.cancelled:
+            self.results[name] = result
+
+    def _profile_data(self):
+        profile_data = profile.fetch_profile_data(self.access_token, max_workers=1)
+        return profile_data if profile_data['profile'] is not None else None
+
+    def _playlist_index(self):
+        return playlist_index.load_playlist_index(self.access_token)
+
+    def _library(self):
+        user_profile = get_spotify_user_profile(self.access_token)
+        if user_profile is None or self.cancelled:
+            return None
+
+        def fetch_features(track_ids):
+            return get_tracks_features(track_ids, self.access_token)
+
+        if has_snapshot(user_profile['id']):
+            sync_library(user_profile['id'], self.access_token, fetch_features)
+            return None
+        max_items = WARMUP_SAVED_PAGES * PAGE_SIZE
+        with closing(iter_saved_track_records(self.access_token, max_items=max_items, max_workers=1)) as pages:
+            for page in pages:
+                if self.cancelled:
+                    break
+                fetch_features([record.id for record in page if record.id])
+        return None
+
+    def _listening_history(self):
+        user_profile = get_spotify_user_profile(self.access_token)
+        if user_profile is not None and not self.cancelled:
+            collect_history(user_profile['id'], self.access_token,
+                            lambda track_ids: get_tracks_features(track_ids, self.access_token))
+        return None
+
+
+def start_warm_up(session_state, access_token):
+    """Cancels any earlier warm-up of this session and starts a new one for access_token."""
+    cancel_warm_up(session_state)
+    session_state[SESSION_KEY] = WarmUp(access_token).start()
+
+
+def cancel_warm_up(session_state):
+    warm_up = session_state.pop(SESSION_KEY, None)
+    if warm_up is not None:
+        warm_up.cancel()
+
+
+def adopt_warm_up(session_state):
+    """Moves finished session-scoped warm-up results into the session, unless the page already has its own."""
+    warm_up = session_state.get(SESSION_KEY)
+    if warm_up is None:
+        return
+    # Checked first, so a task finishing during the loop is picked up on the next rerun
+    finished = warm_up.done()
+    for name, key in (("profile_data", profile.SESSION_KEY), ("playlist_index", playlist_index.SESSION_KEY)):
+        result = warm_up.results.pop(name, None)
+        if result is not None and key not in session_state:
+            session_state[key] = result
+    if finished:
+        session_state.pop(SESSION_KEY, None)
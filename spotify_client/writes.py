@@ -0,0 +1,132 @@
+"""
+Batched writes of many tracks to many destinations.
+
+add_tracks() adds a list of tracks to any mix of playlists and Liked Songs. Each
+destination is written on its own worker, so different playlists are filled
+concurrently, while the chunks for one destination go out in order: 100 URIs per
+playlist POST and 50 IDs per Liked Songs PUT.
+
+Saving to Liked Songs is a PUT and is retried by http_client like any idempotent
+request. Adding to a playlist is a POST, and a 5xx or a dropped connection may
+still have applied it, so every chunk is sent with an explicit `position`. Before
+a failed chunk is sent again, the playlist is read at that position; if the
+chunk is already there, it is not added a second time.
+"""
+import time
+
+import requests
+
+from spotify_client import http_client
+from spotify_client.concurrency import ContextThreadPoolExecutor
+from spotify_client.http_client import SpotifyAPIError, backoff_delay
+from spotify_client.pagination import API_URL, fetch_page
+from spotify_client.records import track_record
+
+PLAYLIST_BATCH_SIZE = 100
+LIBRARY_BATCH_SIZE = 50
+CHUNK_RETRIES = 3
+MAX_WORKERS = 4
+
+# Destination standing for the user's Liked Songs, next to playlist IDs
+LIKED_SONGS = "Liked Songs"
+
+
+def track_uri(track_id):
+    return f"spotify:track:{track_id}"
+
+
+def _playlist_tracks_url(playlist_id):
+    return f"{API_URL}/playlists/{playlist_id}/tracks"
+
+
+def _chunk_applied(playlist_id, uris, position, access_token):
+    page = fetch_page(_playlist_tracks_url(playlist_id), access_token, position, len(uris), project=track_record)
+    return [record.uri for record in page['items']] == uris
+
+
+def _add_chunk(playlist_id, uris, position, access_token):
+    """Adds one chunk at position; returns the new snapshot_id (None if a retry found the chunk already applied)."""
+    url = _playlist_tracks_url(playlist_id)
+    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+    attempt = 0
+    while True:
+        try:
+            response = http_client.post(url, headers=headers, json={"uris": uris, "position": position})
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= CHUNK_RETRIES:
+                raise
+        else:
+            if response.status_code in (200, 201):
+                return response.json().get('snapshot_id')
+            if response.status_code < 500 or attempt >= CHUNK_RETRIES:
+                raise SpotifyAPIError(response)
+        if _chunk_applied(playlist_id, uris, position, access_token):
+            return None
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+def add_to_playlist(playlist_id, track_uris, access_token, batch_size=PLAYLIST_BATCH_SIZE):
+    """
+    Appends track_uris to a playlist in order, batch_size URIs per request.
+    Returns the playlist's snapshot_id after the last chunk (None if nothing was added or it is unknown).
+    Raises SpotifyAPIError if a chunk can't be added.
+    """
+    if not track_uris:
+        return None
+    position = fetch_page(_playlist_tracks_url(playlist_id), access_token, 0, 1).get('total') or 0
+    snapshot_id = None
+    for i in range(0, len(track_uris), batch_size):
+        chunk = list(track_uris[i:i + batch_size])
+        snapshot_id = _add_chunk(playlist_id, chunk, position, access_token)
+        position += len(chunk)
+    return snapshot_id
+
+
+def save_to_library(track_ids, access_token, batch_size=LIBRARY_BATCH_SIZE):
+    """Saves tracks to Liked Songs, batch_size IDs per request. Raises SpotifyAPIError if a chunk fails."""
+    url = f"{API_URL}/me/tracks"
+    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+    for i in range(0, len(track_ids), batch_size):
+        response = http_client.put(url, headers=headers, json={"ids": list(track_ids[i:i + batch_size])})
+        if response.status_code not in (200, 201):
+            raise SpotifyAPIError(response)
+
+
+class WriteResult:
+    def __init__(self, destination, added=0, snapshot_id=None, error=None):
+        self.destination = destination
+        self.added = added
+        self.snapshot_id = snapshot_id
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _write(destination, track_ids, access_token):
+    try:
+        if destination == LIKED_SONGS:
+            save_to_library(track_ids, access_token)
+            return WriteResult(destination, len(track_ids))
+        snapshot_id = add_to_playlist(destination, [track_uri(track_id) for track_id in track_ids], access_token)
+        return WriteResult(destination, len(track_ids), snapshot_id)
+    except (SpotifyAPIError, requests.RequestException) as e:
+        return WriteResult(destination, error=e)
+
+
+def add_tracks(track_ids, destinations, access_token, max_workers=MAX_WORKERS):
+    """
+    Adds every track to every destination (playlist IDs and/or LIKED_SONGS), destinations concurrently.
+    Duplicate track IDs are added once. Returns {destination: WriteResult}; a failed destination doesn't
+    stop the others.
+    """
+    track_ids = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+    destinations = list(dict.fromkeys(destinations))
+    if not track_ids or not destinations:
+        return {destination: WriteResult(destination) for destination in destinations}
+    with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(destinations)))) as executor:
+        futures = {destination: executor.submit(_write, destination, track_ids, access_token)
+                   for destination in destinations}
+        return {destination: future.result() for destination, future in futures.items()}
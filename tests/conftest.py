@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# The package reads its cache locations at import time, so keep the tests' caches out of the real ones.
+_cache_dir = tempfile.mkdtemp(prefix="spotify-tests-")
+os.environ.setdefault("FEATURES_CACHE_PATH", os.path.join(_cache_dir, "audio_features.sqlite3"))
+os.environ.setdefault("LIBRARY_CACHE_DIR", os.path.join(_cache_dir, "library"))
+os.environ.setdefault("COMBINED_PLAYLISTS_DIR", os.path.join(_cache_dir, "combined"))
+os.environ.setdefault("HISTORY_CACHE_DIR", os.path.join(_cache_dir, "history"))
+
+from fake_spotify import FakeSpotify, FakeSpotifyConfig  # noqa: E402
+from spotify_client import http_client  # noqa: E402
+from spotify_client.shared_cache import shared_cache  # noqa: E402
+
+
+@pytest.fixture
+def fake_spotify(request):
+    """A FakeSpotify on a free port with api.spotify.com redirected to it; pass a config with indirect parametrize."""
+    config = getattr(request, "param", None) or FakeSpotifyConfig(library_size=200, playlist_count=3,
+                                                                  playlist_size=10, latency=0)
+    server = FakeSpotify(config).start()
+    http_client.redirect("https://api.spotify.com", server.url)
+    http_client.redirect("https://accounts.spotify.com", server.url)
+    shared_cache.clear()
+    yield server
+    server.stop()
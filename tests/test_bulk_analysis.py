@@ -0,0 +1,54 @@
+import io
+import os
+import runpy
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from spotify_client.http_client import SpotifyAPIError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def home():
+    return runpy.run_path(os.path.join(ROOT, "Home.py"), run_name="test")
+
+
+@pytest.mark.parametrize("content", [b"", b'track,artist\n"unterminated,x\n', b"\xff\xfe\x00bad"])
+def test_read_track_list_raises_value_error_for_unreadable_csv(home, content):
+    with pytest.raises(ValueError):
+        home["read_track_list"](io.BytesIO(content))
+
+
+def test_connection_error_marks_only_that_row_unmatched(home, fake_spotify, monkeypatch):
+    search = home["iter_bulk_features"].__globals__["search_track_id"]
+
+    def flaky_search(track_name, artist, *args):
+        if track_name == "Track 2":
+            raise requests.ConnectionError("dropped")
+        return search(track_name, artist, *args)
+
+    monkeypatch.setitem(home["iter_bulk_features"].__globals__, "search_track_id", flaky_search)
+    tracks = pd.DataFrame({"track": ["Track 1", "Track 2", "Track 3"], "artist": ["Artist 1", "Artist 2", "Artist 3"]})
+    rows = [row for batch in home["iter_bulk_features"](tracks, "token") for row in batch]
+
+    by_track = {row["track"]: row["track_id"] for row in rows}
+    assert by_track["Track 2"] is None
+    assert by_track["Track 1"] and by_track["Track 3"]
+
+
+def test_error_does_not_wait_for_queued_searches(home, fake_spotify, monkeypatch):
+    def failing_rows(*args):
+        raise SpotifyAPIError(requests.Response())
+
+    monkeypatch.setitem(home["iter_bulk_features"].__globals__, "bulk_result_rows", failing_rows)
+    # 200 searches would take about 20 s at BULK_SEARCH_RATE
+    tracks = pd.DataFrame({"track": [f"Track {n}" for n in range(200)], "artist": [f"Artist {n}" for n in range(200)]})
+    started = time.monotonic()
+    with pytest.raises(SpotifyAPIError):
+        list(home["iter_bulk_features"](tracks, "token", batch_size=1))
+
+    assert time.monotonic() - started < 5
@@ -0,0 +1,35 @@
+import os
+import runpy
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def page():
+    return runpy.run_path(os.path.join(ROOT, "pages", "Combine Playlists.py"), run_name="test")
+
+
+def test_combined_state_is_only_offered_to_its_owner(page):
+    playlists_by_id = {"combined1": {"id": "combined1", "owner": {"id": "alice"}}}
+    page["save_combined_state"]("alice", "combined1", "Mix", {"source": "snapshot"})
+
+    assert list(page["load_combined_states"]("alice", playlists_by_id)) == ["combined1"]
+    # bob follows alice's playlist, so it is in his /me/playlists too
+    assert page["load_combined_states"]("bob", playlists_by_id) == {}
+
+
+def test_combined_state_path_sanitizes_ids(page):
+    path = page["combined_state_path"]("../evil", "../../x")
+    assert os.path.dirname(os.path.dirname(path)) == page["COMBINED_DIR"]
+
+
+def test_unreadable_state_is_skipped(page):
+    playlists_by_id = {playlist_id: {"id": playlist_id, "owner": {"id": "carol"}} for playlist_id in ("good", "bad")}
+    page["save_combined_state"]("carol", "good", "Mix", {"source": "snapshot"})
+    with open(page["combined_state_path"]("carol", "bad"), "w") as f:
+        f.write('{"name": "Trunc')
+
+    assert list(page["load_combined_states"]("carol", playlists_by_id)) == ["good"]
+    assert not any(name.endswith(".tmp") for name in os.listdir(page["combined_state_dir"]("carol")))
@@ -0,0 +1,27 @@
+import time
+
+from fake_spotify import make_features, track_id
+
+from spotify_client.features_cache import FeaturesCache
+
+
+def test_least_recently_used_features_are_evicted():
+    cache = FeaturesCache(":memory:", max_entries=3)
+    for n in range(3):
+        cache.put(make_features(track_id(n)))
+        time.sleep(0.01)
+    assert cache.get(track_id(0))["energy"] == make_features(track_id(0))["energy"]
+    time.sleep(0.01)
+
+    cache.put(make_features(track_id(3)))
+
+    assert len(cache) == 3
+    assert set(cache.get_many([track_id(n) for n in range(4)])) == {track_id(0), track_id(2), track_id(3)}
+
+
+def test_hits_and_misses_are_counted_once_per_track():
+    cache = FeaturesCache(":memory:")
+    cache.put_many([make_features(track_id(1)), None])
+
+    assert set(cache.get_many([track_id(1), track_id(1), track_id(2), None])) == {track_id(1)}
+    assert cache.stats() == dict(cache.stats(), hits=1, misses=1, entries=1)
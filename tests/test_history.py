@@ -0,0 +1,99 @@
+import os
+import time
+import types
+from datetime import datetime, timezone
+
+import fake_spotify as fake_module
+import pytest
+from fake_spotify import make_features
+
+from spotify_client.features_cache import FEATURE_NAMES
+from spotify_client.history import ListeningHistory, collect_history, fetch_plays_after, played_at_ms
+
+NOW = 1700000000
+PLAY_MS = 240000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freezes the fake's clock; it plays a track every 4 minutes going back from clock.now."""
+    clock = types.SimpleNamespace(now=NOW)
+    monkeypatch.setattr(fake_module, "time", types.SimpleNamespace(
+        time=lambda: clock.now, strftime=time.strftime, gmtime=time.gmtime, sleep=time.sleep))
+    return clock
+
+
+def fetch_features(track_ids):
+    return {track: make_features(track) for track in track_ids}
+
+
+def plays_before(now, count):
+    """Unix ms of the fake's last `count` plays before `now`, oldest first."""
+    return [now * 1000 - n * PLAY_MS for n in reversed(range(count))]
+
+
+def test_played_at_ms_reads_utc_timestamps():
+    assert played_at_ms("2023-11-14T22:13:20.000Z") == NOW * 1000
+    assert played_at_ms("2023-11-14T22:13:20") == NOW * 1000
+
+
+def test_only_plays_after_the_cursor_are_fetched(fake_spotify, clock):
+    plays = fetch_plays_after("token", 0)
+    assert [played for played, _ in plays] == plays_before(NOW, 50)
+    assert plays[-1][1].name == "Track 0"
+    # A full page asks again from its newest play, which finds nothing newer
+    assert fake_spotify.requests["GET /v1/me/player/recently-played"] == 2
+
+    fake_spotify.reset_counts()
+    plays = fetch_plays_after("token", plays_before(NOW, 11)[0])
+    assert [played for played, _ in plays] == plays_before(NOW, 10)
+    assert fake_spotify.requests["GET /v1/me/player/recently-played"] == 1
+
+
+def test_each_poll_appends_only_the_new_plays(fake_spotify, clock):
+    history = collect_history("polled_user", "token", fetch_features)
+    assert len(history) == 50
+    assert history.aggregates["after"] == NOW * 1000
+
+    # Within the poll interval nothing is fetched
+    fake_spotify.reset_counts()
+    assert len(collect_history("polled_user", "token", fetch_features)) == 50
+    assert fake_spotify.requests["GET /v1/me/player/recently-played"] == 0
+
+    clock.now = NOW + 3 * PLAY_MS // 1000
+    history = collect_history("polled_user", "token", fetch_features, min_interval=0)
+
+    assert len(history) == 53
+    assert history.aggregates["after"] == clock.now * 1000
+    assert history.aggregates["first_played_at"] == plays_before(NOW, 50)[0]
+    segments = sorted(name for name in os.listdir(ListeningHistory.directory("polled_user")) if name.endswith(".npz"))
+    assert segments == [f"segment-{plays_before(NOW, 50)[0]}.npz", f"segment-{NOW * 1000 + PLAY_MS}.npz"]
+
+
+def test_aggregates_count_every_play(fake_spotify, clock):
+    history = collect_history("aggregated_user", "token", fetch_features)
+    played = plays_before(NOW, 50)
+    moments = [datetime.fromtimestamp(ms / 1000, timezone.utc) for ms in played]
+    tracks = [fake_module.track_id(n) for n in range(50)]
+
+    assert history.aggregates["artists"] == {f"Artist {n}": 1 for n in range(50)}
+    assert [count for _, count in history.top_artists(3)] == [1, 1, 1]
+    assert history.aggregates["hours"] == [sum(moment.hour == hour for moment in moments) for hour in range(24)]
+    assert sum(history.aggregates["weekdays"]) == 50
+    assert history.aggregates["dates"] == {moments[0].date().isoformat(): 50}
+    assert history.mean_features() == pytest.approx(
+        {name: sum(make_features(track)[name] for track in tracks) / 50 for name in FEATURE_NAMES}, rel=1e-5)
+
+
+def test_aggregates_are_rebuilt_from_the_segments(fake_spotify, clock):
+    collect_history("rebuilt_user", "token", fetch_features)
+    clock.now = NOW + 3 * PLAY_MS // 1000
+    saved = collect_history("rebuilt_user", "token", fetch_features, min_interval=0).aggregates
+    os.remove(os.path.join(ListeningHistory.directory("rebuilt_user"), "aggregates.json"))
+
+    rebuilt = ListeningHistory.load("rebuilt_user").aggregates
+
+    assert rebuilt["polled_at"] is None
+    for name in ("after", "plays", "first_played_at", "artists", "hours", "weekdays", "dates", "feature_counts"):
+        assert rebuilt[name] == saved[name]
+    assert rebuilt["feature_sums"] == pytest.approx(saved["feature_sums"])
@@ -0,0 +1,40 @@
+from spotify_client.http_cache import CachedPage, CachedResponse
+from spotify_client.pagination import iter_playlist_track_records
+from spotify_client.profile import get_user_top_items
+from spotify_client.records import TrackRecord
+from spotify_client.shared_cache import shared_cache
+
+
+def playlist_uris(playlist_id):
+    return [record.uri for page in iter_playlist_track_records(playlist_id, "token") for record in page]
+
+
+def test_playlist_pages_are_revalidated_and_cached_only_as_records(fake_spotify):
+    playlist_id = next(iter(fake_spotify.playlists))
+    first = playlist_uris(playlist_id)
+    fake_spotify.reset_counts()
+
+    assert playlist_uris(playlist_id) == first
+    assert fake_spotify.requests["GET /v1/playlists/{id}/tracks"] == 1
+
+    entries = [entry[0] for key, entry in shared_cache._entries.items() if key[0] == "playlists"]
+    assert entries and all(isinstance(entry, CachedPage) for entry in entries)
+    assert not any(isinstance(entry, CachedResponse) for entry in entries)
+    assert all(isinstance(record, TrackRecord) for entry in entries for record in entry.page['items'])
+
+
+def test_changed_playlist_page_is_refetched(fake_spotify):
+    playlist_id = next(iter(fake_spotify.playlists))
+    before = playlist_uris(playlist_id)
+    with fake_spotify._lock:
+        fake_spotify.playlists[playlist_id]["tracks"].append(123)
+
+    assert playlist_uris(playlist_id) == before + ["spotify:track:0000000000000000000123"]
+
+
+def test_top_items_are_revalidated_on_every_fetch(fake_spotify):
+    first = get_user_top_items("token", "tracks", "short_term")
+    fake_spotify.reset_counts()
+
+    assert get_user_top_items("token", "tracks", "short_term") == first
+    assert fake_spotify.requests["GET /v1/me/top/tracks"] == 1
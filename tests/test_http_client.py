@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from fake_spotify import track_id
+
+from spotify_client import http_client
+from spotify_client.scheduler import Scheduler, get_scheduler, set_scheduler
+
+TRACKS_URL = "https://api.spotify.com/v1/tracks"
+CREATE_PLAYLIST_URL = "https://api.spotify.com/v1/users/benchmark_user/playlists"
+
+
+@pytest.fixture(autouse=True)
+def scheduler():
+    """A scheduler of the test's own, so injected 429s don't pause or throttle other tests."""
+    previous = get_scheduler()
+    set_scheduler(Scheduler())
+    yield get_scheduler()
+    set_scheduler(previous)
+
+
+@pytest.fixture
+def inject(fake_spotify):
+    """Makes the fake answer its next requests with the given statuses, then normally."""
+    def inject(*statuses):
+        errors = list(statuses)
+        fake_spotify.injected_error = lambda: errors.pop(0) if errors else None
+    return inject
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    attempts = []
+
+    def backoff_delay(attempt):
+        attempts.append(attempt)
+        return 0.0
+
+    monkeypatch.setattr(http_client, "backoff_delay", backoff_delay)
+    return attempts
+
+
+def get_track():
+    return http_client.get(TRACKS_URL, params={"ids": track_id(1)})
+
+
+def test_429_is_retried_after_retry_after(fake_spotify, inject, scheduler):
+    fake_spotify.config.retry_after = 1
+    inject(429)
+    started = time.monotonic()
+
+    response = get_track()
+
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.9
+    assert fake_spotify.requests["GET /v1/tracks"] == 2
+    assert scheduler.stats()["throttled"] == 1
+
+
+def test_5xx_get_is_retried_with_backoff(fake_spotify, inject, backoffs):
+    inject(503, 502)
+
+    assert get_track().status_code == 200
+    assert fake_spotify.requests["GET /v1/tracks"] == 3
+    assert backoffs == [0, 1]
+
+
+def test_last_response_is_returned_after_max_retries(fake_spotify, inject, backoffs):
+    inject(*[503] * 10)
+
+    response = http_client.get(TRACKS_URL, params={"ids": track_id(1)}, max_retries=2)
+
+    assert response.status_code == 503
+    assert fake_spotify.requests["GET /v1/tracks"] == 3
+
+
+def test_post_is_not_retried_on_5xx(fake_spotify, inject, backoffs):
+    inject(503)
+
+    response = http_client.post(CREATE_PLAYLIST_URL, json={"name": "New"})
+
+    assert response.status_code == 503
+    assert fake_spotify.requests["POST /v1/users/benchmark_user/playlists"] == 1
+    assert backoffs == []
+
+
+def test_post_is_retried_on_429(fake_spotify, inject):
+    fake_spotify.config.retry_after = 0
+    inject(429)
+
+    response = http_client.post(CREATE_PLAYLIST_URL, json={"name": "New"})
+
+    assert response.status_code == 201
+    assert fake_spotify.requests["POST /v1/users/benchmark_user/playlists"] == 2
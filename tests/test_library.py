@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from fake_spotify import FakeSpotifyConfig, track_id
+
+from spotify_client.features import get_tracks_features
+from spotify_client.library import LibrarySnapshot, sync_library
+
+
+def fetch_features(track_ids):
+    return get_tracks_features(track_ids, "token")
+
+
+def test_concurrent_syncs_of_one_user_share_a_sync(fake_spotify):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        snapshots = list(executor.map(lambda _: sync_library("concurrent_user", "token", fetch_features), range(4)))
+
+    assert all(len(snapshot) == 200 for snapshot in snapshots)
+    loaded = LibrarySnapshot.load("concurrent_user")
+    assert len(loaded) == 200
+    assert loaded.feature_frame().shape[0] == 200
+
+
+def test_save_replaces_the_snapshot_atomically(fake_spotify):
+    snapshot = sync_library("resaved_user", "token", fetch_features)
+    LibrarySnapshot("resaved_user", snapshot.track_ids[:3], snapshot.names[:3], snapshot.artists[:3],
+                    snapshot.added_at[:3], snapshot.features[:3]).save()
+
+    loaded = LibrarySnapshot.load("resaved_user")
+    assert loaded.track_ids.tolist() == snapshot.track_ids[:3].tolist()
+    assert not any(name.endswith(".tmp") for name in os.listdir(LibrarySnapshot.directory("resaved_user")))
+
+
+LARGE_LIBRARY = FakeSpotifyConfig(library_size=1000, playlist_count=0, latency=0)
+
+
+@pytest.mark.parametrize("fake_spotify", [LARGE_LIBRARY], indirect=True)
+def test_removed_tracks_are_dropped_without_a_full_download(fake_spotify):
+    sync_library("unliking_user", "token", fetch_features)
+    with fake_spotify._lock:
+        for index in (999, 520, 3):
+            del fake_spotify.saved[index]
+        fake_spotify.saved.insert(0, (5000, "2030-01-01T00:00:00Z"))
+    fake_spotify.reset_counts()
+
+    snapshot = sync_library("unliking_user", "token", fetch_features)
+
+    assert snapshot.track_ids.tolist() == [track_id(n) for n, _ in fake_spotify.saved]
+    assert np.isnan(snapshot.features).sum() == 0
+    # 20 pages: a full download would fetch all of them
+    assert fake_spotify.requests["GET /v1/me/tracks"] <= 12
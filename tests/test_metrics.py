@@ -0,0 +1,15 @@
+from spotify_client.metrics import Metrics
+
+
+def test_prometheus_text_mixes_connection_errors_and_http_statuses():
+    metrics = Metrics()
+    metrics.record("GET", "/v1/me", 200, 100, 0.01)
+    metrics.record("GET", "/v1/me", "error", 0, 0.5)
+    metrics.record("GET", "/v1/me", 429, 0, 0.02)
+
+    text = metrics.prometheus_text()
+
+    assert 'endpoint="/v1/me",status="error"} 1' in text
+    assert 'endpoint="/v1/me",status="200"} 1' in text
+    assert 'endpoint="/v1/me",status="429"} 1' in text
+    assert metrics.summary()[0]["errors"] == 2
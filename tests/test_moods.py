@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from fake_spotify import make_features, track_id
+
+from spotify_client.moods import MOOD_OPTIONS, build_feature_frame, classify_moods, mood_track_ids
+
+
+def matches_one_by_one(features, criteria):
+    """The per-track check the vectorized classification replaces."""
+    return all(low <= features[key[:-len("_range")]] <= high for key, (low, high) in criteria.items())
+
+
+def test_classification_matches_a_per_track_check():
+    track_ids = [track_id(n) for n in range(300)]
+    features_by_id = {track: make_features(track) for track in track_ids}
+
+    matches = classify_moods(build_feature_frame(track_ids, features_by_id))
+
+    for mood, criteria in MOOD_OPTIONS.items():
+        expected = [track for track in track_ids if matches_one_by_one(features_by_id[track], criteria)]
+        assert mood_track_ids(matches, mood) == expected
+        assert expected
+
+
+def test_bounds_are_inclusive_and_unknown_features_never_match():
+    frame = pd.DataFrame({"valence": [0.5, 0.49, np.nan, 0.9], "energy": [1.0, 0.9, 0.9, np.nan]},
+                         index=["edge", "below", "no_valence", "no_energy"])
+
+    matches = classify_moods(frame, {"happy": {"valence_range": (0.5, 1.0), "energy_range": (0.4, 1.0)},
+                                     "bright": {"valence_range": (0.5, 1.0)}})
+
+    assert mood_track_ids(matches, "happy") == ["edge"]
+    assert mood_track_ids(matches, "bright") == ["edge", "no_energy"]
+
+
+def test_feature_frame_keeps_order_and_drops_tracks_without_features():
+    features_by_id = {track_id(n): make_features(track_id(n)) for n in (3, 1)}
+    features_by_id[track_id(2)] = None
+
+    frame = build_feature_frame([track_id(n) for n in (3, 2, 1, 4)], features_by_id)
+
+    assert list(frame.index) == [track_id(3), track_id(1)]
+    assert frame.dtypes.unique().tolist() == [np.dtype(float)]
+
+
+def test_mood_track_ids_stops_at_the_limit():
+    matches = pd.DataFrame({"mood": [True, False, True, True]}, index=list("abcd"))
+
+    assert mood_track_ids(matches, "mood", limit=2) == ["a", "c"]
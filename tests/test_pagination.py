@@ -0,0 +1,24 @@
+import pytest
+from fake_spotify import FakeSpotifyConfig, track_id
+
+from spotify_client.pagination import get_all_items, iter_saved_tracks
+
+JITTERY = FakeSpotifyConfig(library_size=500, playlist_count=0, latency=0.001, latency_jitter=0.02, seed=3)
+
+
+@pytest.mark.parametrize("fake_spotify", [JITTERY], indirect=True)
+def test_pages_are_yielded_in_order_whatever_order_they_arrive_in(fake_spotify):
+    totals = []
+    pages = list(iter_saved_tracks("token", max_workers=8, on_total=totals.append))
+
+    assert totals == [500]
+    assert [len(page) for page in pages] == [50] * 10
+    assert [item['track']['id'] for page in pages for item in page] == [track_id(n) for n in range(500)]
+
+
+def test_max_items_stops_early(fake_spotify):
+    fake_spotify.reset_counts()
+    items = get_all_items("https://api.spotify.com/v1/me/tracks", "token", limit=50, max_items=120)
+
+    assert len(items) == 150
+    assert fake_spotify.requests["GET /v1/me/tracks"] == 3
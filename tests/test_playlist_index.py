@@ -0,0 +1,23 @@
+import pytest
+from fake_spotify import FakeSpotifyConfig
+
+from spotify_client.playlist_index import REVALIDATE_SECONDS, SESSION_KEY, get_playlist_index
+
+MANY_PLAYLISTS = FakeSpotifyConfig(library_size=200, playlist_count=120, playlist_size=1, latency=0)
+
+
+@pytest.mark.parametrize("fake_spotify", [MANY_PLAYLISTS], indirect=True)
+def test_change_on_a_later_page_is_picked_up_on_revalidation(fake_spotify):
+    session_state = {}
+    index = get_playlist_index(session_state, "token")
+    assert len(index) == 120
+    last_id = list(fake_spotify.playlists)[-1]
+    with fake_spotify._lock:
+        fake_spotify.playlists[last_id]["snapshot"] += 1
+
+    assert get_playlist_index(session_state, "token") is index
+    index.loaded_at -= REVALIDATE_SECONDS
+
+    revalidated = get_playlist_index(session_state, "token")
+    assert revalidated.by_id[last_id]["snapshot_id"] == fake_spotify.playlist_object(last_id)["snapshot_id"]
+    assert session_state[SESSION_KEY] is revalidated
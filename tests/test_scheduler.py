@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spotify_client.rate_limit import TokenBucket
+from spotify_client.scheduler import BACKGROUND, INTERACTIVE, Scheduler, endpoint_key
+
+SEARCH_URL = "https://api.spotify.com/v1/search"
+TRACKS_URL = "https://api.spotify.com/v1/tracks"
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_endpoint_key_collapses_ids():
+    assert endpoint_key("https://api.spotify.com/v1/playlists/37i9dQZF1DXcBWIGoYBM5M/tracks?offset=100") == \
+        "/v1/playlists/{id}/tracks"
+    assert endpoint_key("https://api.spotify.com/v1/users/some.user/playlists") == "/v1/users/{id}/playlists"
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert 0 < bucket.try_acquire() <= 0.1
+
+
+def test_requests_beyond_the_burst_wait_for_tokens():
+    scheduler = Scheduler(rate=50, burst=5)
+    started = time.monotonic()
+    for _ in range(15):
+        with scheduler.slot(TRACKS_URL) as report:
+            report(200)
+    # 5 from the burst, the other 10 at 50 per second
+    assert time.monotonic() - started >= 0.18
+
+
+def test_endpoint_limit_caps_concurrency_per_endpoint():
+    scheduler = Scheduler(rate=1000, burst=1000, endpoint_limits={"/v1/search": 2}, default_endpoint_limit=8)
+    lock = threading.Lock()
+    in_flight = {SEARCH_URL: 0, TRACKS_URL: 0}
+    peak = dict(in_flight)
+
+    def send(url):
+        with scheduler.slot(url) as report:
+            with lock:
+                in_flight[url] += 1
+                peak[url] = max(peak[url], in_flight[url])
+            time.sleep(0.02)
+            with lock:
+                in_flight[url] -= 1
+            report(200)
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        list(executor.map(send, [SEARCH_URL, TRACKS_URL] * 6))
+
+    assert peak[SEARCH_URL] == 2
+    assert peak[TRACKS_URL] > 2
+
+
+def test_interactive_requests_go_ahead_of_background_ones():
+    scheduler = Scheduler(rate=1000, burst=1000, max_concurrency=1)
+    order = []
+
+    def send(name, priority):
+        with scheduler.slot(TRACKS_URL, priority) as report:
+            order.append(name)
+            report(200)
+
+    endpoint = scheduler.acquire(TRACKS_URL)
+    background = threading.Thread(target=send, args=("background", BACKGROUND))
+    background.start()
+    wait_until(lambda: scheduler.stats()["waiting_background"] == 1)
+    interactive = threading.Thread(target=send, args=("interactive", INTERACTIVE))
+    interactive.start()
+    wait_until(lambda: scheduler.stats()["waiting_interactive"] == 1)
+    scheduler.release(endpoint, 200)
+    background.join(5)
+    interactive.join(5)
+
+    assert order == ["interactive", "background"]
+
+
+def test_429_halves_the_concurrency_limit_and_successes_grow_it_back():
+    scheduler = Scheduler(rate=1000, burst=1000, max_concurrency=8)
+    endpoint = scheduler.acquire(TRACKS_URL)
+    scheduler.release(endpoint, 429)
+    assert scheduler.stats()["concurrency_limit"] == 4
+    assert scheduler.stats()["throttled"] == 1
+
+    # A burst of 429s within a second only halves the limit once
+    endpoint = scheduler.acquire(TRACKS_URL)
+    scheduler.release(endpoint, 429)
+    assert scheduler.stats()["concurrency_limit"] == 4
+
+    # About one more slot per window of successes
+    for _ in range(5):
+        endpoint = scheduler.acquire(TRACKS_URL)
+        scheduler.release(endpoint, 200)
+    assert scheduler.stats()["concurrency_limit"] == 5
+
+    # Server errors leave the limit alone
+    endpoint = scheduler.acquire(TRACKS_URL)
+    scheduler.release(endpoint, 503)
+    assert scheduler.stats()["concurrency_limit"] == 5
+
+
+def test_retry_after_pauses_every_request():
+    scheduler = Scheduler(rate=1000, burst=1000)
+    with scheduler.slot(TRACKS_URL) as report:
+        report(429, retry_after=0.2)
+    assert scheduler.stats()["paused_for"] > 0
+
+    started = time.monotonic()
+    with scheduler.slot(SEARCH_URL) as report:
+        report(200)
+    assert time.monotonic() - started >= 0.15
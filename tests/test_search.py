@@ -0,0 +1,50 @@
+from fake_spotify import track_id
+
+from spotify_client.features import get_tracks_features
+from spotify_client.library import sync_library
+from spotify_client.search import TrackSearchIndex, get_local_search_index, search_track_id
+
+
+def test_lookup_ignores_case_accents_and_punctuation():
+    index = TrackSearchIndex()
+    index.add("id1", "Café del Mar (Remastered)", "Energy 52")
+    index.add("id2", "Cafe del Mar", "Someone Else")
+
+    assert index.lookup("cafe del mar remastered", "ENERGY 52") == "id1"
+    assert index.lookup("Café del Mar", "someone") == "id2"
+    assert index.lookup("Cafe del Mar", "Nobody") is None
+    assert index.lookup("Cafe del", "") is None
+    assert index.lookup("!!!") is None
+
+
+def test_first_added_track_wins():
+    index = TrackSearchIndex()
+    index.add("id1", "Song", "Artist")
+    index.add("id2", "Song", "Artist")
+    index.add("id1", "Renamed", "Artist")
+
+    assert len(index) == 2
+    assert index.lookup("Song", "Artist") == "id1"
+    assert index.lookup("Renamed") is None
+
+
+def test_remote_search_results_are_cached(fake_spotify):
+    assert search_track_id("Track 7", "Artist 7", "token") == track_id(7)
+    fake_spotify.reset_counts()
+
+    assert search_track_id(" track 7 ", "artist 7", "token") == track_id(7)
+    assert fake_spotify.requests["GET /v1/search"] == 0
+
+
+def test_local_index_picks_up_a_library_synced_after_it_was_built(fake_spotify):
+    session_state = {"access_token": "token"}
+    index = get_local_search_index(session_state)
+    assert len(index) == 0
+
+    sync_library("benchmark_user", "token", lambda track_ids: get_tracks_features(track_ids, "token"))
+
+    assert get_local_search_index(session_state) is index
+    assert len(index) == 200
+    fake_spotify.reset_counts()
+    assert search_track_id("Track 12", "Artist 12", "token", index) == track_id(12)
+    assert fake_spotify.requests["GET /v1/search"] == 0
@@ -0,0 +1,69 @@
+import pickle
+
+from spotify_client.shared_cache import _ENTRY_OVERHEAD, MISSING, SQLiteBackend, SharedCache
+
+
+def entry_size(value):
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) + _ENTRY_OVERHEAD
+
+
+def test_least_recently_used_entries_are_evicted_across_namespaces():
+    value = "x" * 1000
+    cache = SharedCache(budget_bytes=3 * entry_size(value))
+    cache.set("features", "a", value)
+    cache.set("search", "b", value)
+    cache.set("features", "c", value)
+    assert cache.get("features", "a") == value
+
+    cache.set("profile", "d", value)
+
+    assert cache.get("search", "b") is MISSING
+    assert {key for _, key in cache._entries} == {"a", "c", "d"}
+    assert cache.stats("search")["evictions"] == 1
+    assert cache.stats()["bytes"] == cache.bytes == 3 * entry_size(value)
+
+
+def test_byte_accounting_follows_replacements_and_pops():
+    cache = SharedCache(budget_bytes=10 ** 6)
+    cache.set("features", "a", "x" * 100)
+    cache.set("features", "a", "x" * 500)
+    cache.set("search", "b", "y" * 200)
+    assert cache.stats("features") == dict(cache.stats("features"), entries=1, bytes=entry_size("x" * 500))
+    assert cache.bytes == entry_size("x" * 500) + entry_size("y" * 200)
+
+    cache.pop("features", "a")
+    cache.pop("features", "missing")
+    assert cache.stats("features")["bytes"] == 0
+    assert cache.bytes == cache.stats("search")["bytes"] == entry_size("y" * 200)
+
+    cache.clear()
+    assert cache.bytes == 0 and cache.stats()["entries"] == 0
+
+
+def test_entry_over_the_budget_is_not_kept():
+    cache = SharedCache(budget_bytes=1000)
+    cache.set("features", "small", "x")
+    cache.set("features", "huge", "x" * 5000)
+
+    assert cache.get("features", "huge") is MISSING
+    assert cache.get("features", "small") == "x"
+    assert cache.bytes == entry_size("x")
+
+
+def test_expired_entries_are_misses():
+    cache = SharedCache(ttls={"search": 0})
+    cache.set("search", "query", ["result"])
+
+    assert cache.get("search", "query") is MISSING
+    assert cache.stats("search") == dict(cache.stats("search"), hits=0, misses=1, entries=0, bytes=0)
+
+
+def test_corrupt_backend_entry_is_a_miss_and_deleted(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    backend.set_many("features", [("good", pickle.dumps({"energy": 0.5})), ("bad", b"not a pickle")], 60)
+    cache = SharedCache(backend=backend)
+
+    assert cache.get_many("features", ["good", "bad"]) == {"good": {"energy": 0.5}}
+    assert cache.stats()["backend_errors"] == 1
+    assert cache.stats("features")["misses"] == 1
+    assert backend.get_many("features", ["good", "bad"]).keys() == {"good"}
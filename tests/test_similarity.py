@@ -0,0 +1,74 @@
+import numpy as np
+from fake_spotify import make_features, track_id
+
+from spotify_client.features_cache import FEATURE_NAMES
+from spotify_client.library import LibrarySnapshot
+from spotify_client.similarity import SIMILARITY_FEATURES, SimilarityIndex, normalize
+
+
+def library(count):
+    return {track_id(n): make_features(track_id(n)) for n in range(count)}
+
+
+def nearest_one_by_one(features_by_id, seeds, k, weights=None, exclude_ids=()):
+    """The per-track distance loop the matrix query replaces."""
+    vectors = {track: normalize([[features[name] for name in SIMILARITY_FEATURES]])[0]
+               for track, features in features_by_id.items()}
+    centroid = np.mean([vectors[seed["id"]] for seed in seeds], axis=0)
+    w = np.array([(weights or {}).get(name, 1.0) for name in SIMILARITY_FEATURES])
+    distances = {track: float(np.sqrt((((vector - centroid) ** 2) * w).sum()))
+                 for track, vector in vectors.items() if track not in exclude_ids}
+    return sorted(distances, key=distances.get)[:k]
+
+
+def test_query_returns_the_nearest_tracks_in_order():
+    features_by_id = library(500)
+    index = SimilarityIndex(capacity=16)
+    assert index.add_features(features_by_id) == 500
+    seeds = [features_by_id[track_id(n)] for n in (1, 2, 3)]
+    weights = {"valence": 2.0, "tempo": 0.5}
+
+    results = index.query(seeds, k=20, weights=weights, exclude_ids=[track_id(n) for n in (1, 2, 3)])
+
+    assert [track for track, _ in results] == \
+        nearest_one_by_one(features_by_id, seeds, 20, weights, exclude_ids={track_id(n) for n in (1, 2, 3)})
+    distances = [distance for _, distance in results]
+    assert distances == sorted(distances)
+
+
+def test_a_seed_in_the_index_is_its_own_nearest_neighbour():
+    features_by_id = library(50)
+    index = SimilarityIndex()
+    index.add_features(features_by_id)
+
+    [(nearest, distance)] = index.query([features_by_id[track_id(7)]], k=1)
+
+    assert nearest == track_id(7)
+    assert distance < 1e-6
+
+
+def test_tracks_without_features_are_not_indexed_and_k_is_capped():
+    features_by_id = library(5)
+    features_by_id[track_id(0)] = dict(features_by_id[track_id(0)], valence=None)
+    index = SimilarityIndex()
+
+    assert index.add_features(features_by_id) == 4
+    assert index.add_features(features_by_id) == 0
+    assert track_id(0) not in index
+    assert len(index.query([features_by_id[track_id(1)]], k=10, exclude_ids=[track_id(1)])) == 3
+    assert index.query([features_by_id[track_id(0)]]) == []
+
+
+def test_snapshot_tracks_index_like_their_features():
+    features_by_id = library(100)
+    track_ids = list(features_by_id)
+    matrix = np.array([[features_by_id[track][name] for name in FEATURE_NAMES] for track in track_ids],
+                      dtype=np.float32)
+    from_snapshot = SimilarityIndex()
+    from_snapshot.add_features({track: features_by_id[track] for track in track_ids[:10]})
+
+    assert from_snapshot.add_snapshot(LibrarySnapshot("similar_user", track_ids, features=matrix)) == 90
+    from_features = SimilarityIndex()
+    from_features.add_features(features_by_id)
+    seeds = [features_by_id[track_id(n)] for n in (4, 40)]
+    assert from_snapshot.query(seeds, k=15) == from_features.query(seeds, k=15)
@@ -0,0 +1,42 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from spotify_client.single_flight import SingleFlight
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flight.do, "key", slow) for _ in range(4)]
+        deadline = time.monotonic() + 5
+        while flight.shared < 3 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == dict(flight.stats(), hits=3, misses=1, in_flight=0)
+
+
+def test_single_flight_shares_the_leaders_exception():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("key", lambda: "retried") == "retried"
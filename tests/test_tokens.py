@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from spotify_client.tokens import EXPIRY_MARGIN, ClientCredentialsToken, UserToken, refresh_session_token
+
+
+def test_valid_user_token_is_not_refreshed(fake_spotify):
+    token = UserToken("still-good", "refresh", 3600, "client", "secret")
+
+    assert token.get() == "still-good"
+    assert fake_spotify.requests["POST /api/token"] == 0
+
+
+def test_user_token_is_refreshed_shortly_before_it_expires(fake_spotify):
+    token = UserToken("old", "old-refresh", EXPIRY_MARGIN - 1, "client", "secret")
+
+    assert token.get() == "fake-token"
+    assert token.refresh_token == "fake-refresh-token"
+    assert not token.expired
+    assert fake_spotify.requests["POST /api/token"] == 1
+
+
+def test_failed_refresh_logs_the_session_out(fake_spotify):
+    fake_spotify.injected_error = lambda: 400
+    session_state = {"user_token": UserToken("old", "refresh", 0, "client", "secret"), "access_token": "old"}
+
+    assert refresh_session_token(session_state) is None
+    assert "access_token" not in session_state and "user_token" not in session_state
+
+
+def test_token_without_refresh_token_is_dropped():
+    token = UserToken("old", None, 0, "client", "secret")
+
+    assert token.get() is None
+
+
+def test_client_credentials_token_is_fetched_once_for_concurrent_callers(fake_spotify):
+    token = ClientCredentialsToken("client", "secret")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(executor.map(lambda _: token.get(), range(8)))
+
+    assert tokens == ["fake-token"] * 8
+    assert token.get() == "fake-token"
+    assert fake_spotify.requests["POST /api/token"] == 1
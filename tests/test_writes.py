@@ -0,0 +1,52 @@
+import pytest
+from fake_spotify import FakeSpotifyConfig, track_id
+
+from spotify_client.writes import LIKED_SONGS, add_to_playlist, add_tracks, track_uri
+
+LOST_WRITES = FakeSpotifyConfig(library_size=200, playlist_count=1, playlist_size=10, latency=0, lost_write_rate=1.0)
+
+
+def new_track_numbers(count):
+    return list(range(5000, 5000 + count))
+
+
+def test_tracks_are_added_in_order_in_chunks_of_100(fake_spotify):
+    playlist_id = next(iter(fake_spotify.playlists))
+    before = list(fake_spotify.playlists[playlist_id]["tracks"])
+    fake_spotify.reset_counts()
+
+    snapshot_id = add_to_playlist(playlist_id, [track_uri(track_id(n)) for n in new_track_numbers(250)], "token")
+
+    assert fake_spotify.playlists[playlist_id]["tracks"] == before + new_track_numbers(250)
+    assert fake_spotify.requests["POST /v1/playlists/{id}/tracks"] == 3
+    assert snapshot_id == fake_spotify.playlist_object(playlist_id)["snapshot_id"]
+
+
+@pytest.mark.parametrize("fake_spotify", [LOST_WRITES], indirect=True)
+def test_lost_writes_are_not_added_twice(fake_spotify):
+    playlist_id = next(iter(fake_spotify.playlists))
+    before = list(fake_spotify.playlists[playlist_id]["tracks"])
+    fake_spotify.reset_counts()
+
+    snapshot_id = add_to_playlist(playlist_id, [track_uri(track_id(n)) for n in new_track_numbers(250)], "token")
+
+    # Every POST was applied but answered 503; each chunk was checked once and found in place
+    assert fake_spotify.playlists[playlist_id]["tracks"] == before + new_track_numbers(250)
+    assert fake_spotify.requests["POST /v1/playlists/{id}/tracks"] == 3
+    assert snapshot_id is None
+
+
+def test_add_tracks_writes_every_destination(fake_spotify):
+    playlist_ids = list(fake_spotify.playlists)[:2]
+    before = {playlist_id: list(fake_spotify.playlists[playlist_id]["tracks"]) for playlist_id in playlist_ids}
+    new_ids = [track_id(n) for n in new_track_numbers(120)]
+    fake_spotify.reset_counts()
+
+    results = add_tracks(new_ids + new_ids[:5] + [None], playlist_ids + [LIKED_SONGS], "token")
+
+    assert all(result.ok and result.added == 120 for result in results.values())
+    for playlist_id in playlist_ids:
+        assert fake_spotify.playlists[playlist_id]["tracks"] == before[playlist_id] + new_track_numbers(120)
+        assert results[playlist_id].snapshot_id == fake_spotify.playlist_object(playlist_id)["snapshot_id"]
+    assert fake_spotify.requests["PUT /v1/me/tracks"] == 3
+    assert {n for n, _ in fake_spotify.saved} >= set(new_track_numbers(120))